@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "typo"))
+
+from harness import load_typo
+
+
+@pytest.fixture(scope="session")
+def typo(tmp_path_factory):
+    """loaded in a temporary directory, so typo.log ends up there"""
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("typo"))
+    try:
+        return load_typo()
+    finally:
+        os.chdir(cwd)
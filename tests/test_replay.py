@@ -0,0 +1,43 @@
+"""the keystroke log and replaying it through a headless session"""
+import pytest
+
+SECTIONS = ["ab cd", "ef\tghi"]
+# a typo corrected with backspace, a section change, a tab typo corrected and one left in place
+KEYS = ["a", "x", "\x7f", "b", " ", "c", "d", "e", "f", " ", "\x7f", "\t", "g", "z"]
+
+
+@pytest.fixture
+def session(typo):
+    sessionrepr = typo.SessionFileRepr(title="replay", options=typo.SessionOptions(RandomShuffle=False), sections=SECTIONS)
+    session = typo.Session(None, sessionrepr)
+    for n, key in enumerate(KEYS, 1):
+        assert typo.handle_key(session, key, session.t_start_ns + n * 100_000_000)
+    return session
+
+
+def errors(typo_errors) -> list:
+    return [(e.char, e.tipped, e.corrected) for e in typo_errors]
+
+
+def test_keystroke_log_round_trip(typo, session, tmp_path):
+    path = tmp_path / "typo.keys"
+    session.keylog.save(path, session.typed_sections)
+
+    log, sections = typo.KeystrokeLog.load(path)
+    assert sections == SECTIONS
+    assert log.t_start_ns == session.keylog.t_start_ns
+    for column in typo.KeystrokeLog.COLUMNS:
+        assert getattr(log, column) == getattr(session.keylog, column)
+    assert len(log) == len(KEYS)
+    assert list(log.section_starts) == [0, 7]
+
+
+def test_replay_matches_live_session(typo, session):
+    result = typo.replay_session(session.typed_sections, session.keylog)
+
+    assert session.section_nr == 1
+    assert result.accuracy == session.calc_acc()
+    assert result.wpm == session.calc_wpm(session.keylog.t_ns[-1])
+    assert errors(result.typo_errors) == errors(session.corrected_errors_carryover + session.text.corrected_errors)
+    assert errors(result.typo_errors) == [("b", "x", True), ("↹···", " ", True)]
+    assert result.carryovers == session.acc_typed_carryover + [(session.text.get_accuracy(), session.text.completed_count())]
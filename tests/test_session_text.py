@@ -0,0 +1,70 @@
+"""layout, position index and counters of SessionTextObject"""
+import pytest
+
+TEXT = "The quick brown fox jumps over the lazy dog.\nPack my box\twith five dozen liquor jugs.\n\nSphinx of black quartz, judge my vow."
+
+
+@pytest.mark.parametrize("width", [13, 20, 45, 120])
+def test_wrap_gives_back_the_text(typo, width):
+    text = typo.SessionTextObject(TEXT)
+    lines = text.get_guide_chars(width)
+
+    assert "".join(line.text for line in lines) == text.display_text
+    assert all(len(line) <= width for line in lines)
+    assert [line.start for line in lines[1:]] == [line.end for line in lines[:-1]]
+    # the layout is computed once per width
+    assert text.get_layout(width) is text.get_layout(width)
+
+
+def test_position_after_backspace(typo):
+    text = typo.SessionTextObject(TEXT)
+    lines = text.get_guide_chars(20)
+
+    def scan(i: int) -> tuple:
+        # what the position index replaces: the first line that holds display cell i
+        d = text.display_offsets[i]
+        for n, line in enumerate(lines):
+            if d < line.end:
+                return n, d - line.start
+        return len(lines) - 1, len(lines[-1])
+
+    for c in TEXT[:60]:
+        text.type_char(c)
+    for _ in range(15):
+        text.type_backspace()
+        i = len(text.typed)
+        assert text.position(i, 20) == (*scan(i), TEXT[i])
+    assert text.position(len(TEXT), 20) == (*scan(len(TEXT)), "")
+
+
+def test_counters(typo):
+    text = typo.SessionTextObject("ab  c\td")
+    for c in "ax  ":
+        text.type_char(c)
+    assert (text.n_correct, text.n_wrong, text.completed_count()) == (3, 1, 4)
+    assert text.get_accuracy() == 75.0
+
+    text.type_backspace()  # correct space
+    text.type_backspace()  # correct space
+    text.type_backspace()  # the typo
+    assert (text.n_correct, text.n_wrong, text.completed_count()) == (1, 0, 1)
+    for c in "b  c d":
+        text.type_char(c)
+    assert (text.n_correct, text.n_wrong, text.completed_count()) == (6, 1, 7)
+    # the corrected typo still counts
+    assert text.get_accuracy() == 6 / (7 + 1) * 100
+
+
+def test_corrected_errors(typo):
+    text = typo.SessionTextObject("ab  c\td")
+    for c in "ab   ":
+        text.type_char(c)
+    text.type_backspace()  # a space where 'c' is expected
+    for c in "c ":
+        text.type_char(c)
+    text.type_backspace()  # a space where the tab is expected
+
+    # double spaces are kept, the tab is recorded as it is shown
+    assert text.raw_text == "ab  c\td"
+    assert [(e.char, e.tipped, e.corrected) for e in text.corrected_errors] == [("c", " ", True), ("↹···", " ", True)]
+    assert (text.n_correct, text.n_wrong) == (5, 0)
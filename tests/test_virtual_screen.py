@@ -0,0 +1,122 @@
+"""snapshots of what the session and the picker draw on a VirtualScreen"""
+import curses
+
+import pytest
+
+WORDS = "alpha bravo charlie delta echo foxtrot golf hotel india juliett kilo lima".split()
+
+
+def pairs(screen, y: int, x0: int, x1: int) -> str:
+    """color pair of every cell in a row, '.' for cells without attributes"""
+    return "".join(str((screen.attr(y, x) >> 8) & 0xFF) if screen.attr(y, x) else "." for x in range(x0, x1))
+
+
+@pytest.fixture
+def content():
+    return [[f"row {i:02d} {w}"] for i, w in enumerate(WORDS)]
+
+
+def test_draw_characters(typo):
+    stdscr = typo.init_virtual_screen(20, 60)
+    sessionrepr = typo.SessionFileRepr(
+        title="snapshot",
+        options=typo.SessionOptions(RandomShuffle=False),
+        sections=["The quick brown fox jumps over the lazy dog.\nPack my box\twith five dozen liquor jugs."],
+    )
+    session = typo.Session(stdscr, sessionrepr)
+    for c in "The quick brwn":
+        session.type_char(c)
+    session.type_backspace()
+    session.draw_characters()
+
+    screen = stdscr.screen
+    # the wpm and accuracy windows depend on the clock, only the text window is compared
+    assert screen.lines()[5:14] == [
+        "    ┌──────────────────────────────────────────────────┐    ",
+        "    │                                                  │    ",
+        "    │   The quick brwwn fox jumps over the lazy        │    ",
+        "    │   dog.⏎                                          │    ",
+        "    │   Pack my box↹···with five dozen liquor jugs.    │    ",
+        "    │                                                  │    ",
+        "    │                                                  │    ",
+        "    │                                                  │    ",
+        "    └──────────────────────────────────────────────────┘    ",
+    ]
+    # 2 is correct, 3 is the underlined typo, what is left to type has no attributes
+    assert pairs(screen, 7, 8, 23) == "2222222222223.."
+    assert screen.attr(7, 20) & curses.A_UNDERLINE
+    # the terminal cursor sits on the 'w' after the typo
+    assert screen.cursor == (7, 21)
+
+
+def test_make_viewport_grid(typo, content):
+    stdscr = typo.init_virtual_screen(8, 30)
+    stdscr.screen.feed([curses.KEY_DOWN] * 8 + ["\n"])
+
+    assert typo.ViewportGrid(stdscr, 30, 1, content).make_viewport_grid() == (8, 0)
+    # the last row stays empty, the highlighted row is the second to last after scrolling
+    assert stdscr.screen.lines() == [
+        "row 02 charlie                ",
+        "row 03 delta                  ",
+        "row 04 echo                   ",
+        "row 05 foxtrot                ",
+        "row 06 golf                   ",
+        "row 07 hotel                  ",
+        "row 08 india                  ",
+        "                              ",
+    ]
+    assert [y for y in range(8) if stdscr.screen.attr(y, 0) & curses.A_STANDOUT] == [6]
+
+
+def test_make_viewport_grid_search(typo, content):
+    stdscr = typo.init_virtual_screen(8, 30)
+    search = typo.SearchIndex([row[0] for row in content])
+    stdscr.screen.feed(["o", "l", curses.KEY_DOWN, "\n"])
+
+    # rows are numbered as in content, not as filtered
+    assert typo.ViewportGrid(stdscr, 30, 1, content, search=search).make_viewport_grid() == (2, 0)
+    assert stdscr.screen.lines() == [
+        "row 00 alpha                  ",
+        "row 02 charlie                ",
+        "row 03 delta                  ",
+        "row 06 golf                   ",
+        "row 07 hotel                  ",
+        "row 09 juliett                ",
+        "row 10 kilo                   ",
+        "/ol  (8/12)                   ",
+    ]
+
+
+def test_make_viewport_grid_without_input(typo, content):
+    stdscr = typo.init_virtual_screen(8, 30)
+    with pytest.raises(curses.error):
+        typo.ViewportGrid(stdscr, 30, 1, content).make_viewport_grid()
+
+
+def test_make_viewport_grid_preview(typo, content):
+    class LoadedCache:
+        def get(self, path):
+            srepr = typo.SessionFileRepr(path, typo.SessionOptions(RandomShuffle=False), ["first section"])
+            return typo.CachedSession(srepr, f"first section of {path}\nsecond line")
+
+    entries = [typo.CorpusEntry(row[0], 0, 0, row[0].upper(), 1, 13, "abc") for row in content]
+    preview = typo.SessionPreview(entries, LoadedCache())
+    stdscr = typo.init_virtual_screen(12, 40)
+    stdscr.screen.feed([curses.KEY_DOWN, curses.KEY_DOWN, "\n"])
+
+    assert typo.ViewportGrid(stdscr, 40, 1, content, preview=preview).make_viewport_grid() == (2, 0)
+    # the preview takes the rows below the grid, the grid keeps its empty last row
+    assert stdscr.screen.lines() == [
+        "row 00 alpha                            ",
+        "row 01 bravo                            ",
+        "row 02 charlie                          ",
+        "row 03 delta                            ",
+        "row 04 echo                             ",
+        "                                        ",
+        "─────────────────────────────────────── ",
+        "ROW 02 CHARLIE: 1 sections, 13 chars    ",
+        "3 different chars: abc                  ",
+        "first section of row 02 charlie         ",
+        "second line                             ",
+        "                                        ",
+    ]
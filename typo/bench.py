@@ -0,0 +1,150 @@
+"""
+Keystroke benchmark over the bundled corpora.
+
+Types every section of every session file under res/ into a Session on a VirtualScreen, at several
+widths, with a mix of typos and backspaces. Reports p50/p95/p99 of the time spent applying a key,
+looking up the layout and rendering the frame, and writes everything as json so runs can be compared:
+
+    python typo/bench.py -o bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from harness import load_typo, percentiles
+
+HERE = Path(__file__).resolve().parent
+
+typo = load_typo()
+
+SCREEN_LINES = 40
+US_PER_NS = 1e-3  # samples are taken in ns, reported in us
+
+
+def screen_cols(width: int) -> int:
+    """terminal width that gives a text area of <width> columns"""
+    margin, padding = typo.CONFIG.BORDER_MARGIN, typo.CONFIG.BORDER_PADDING
+    # the text area is the sessionscreen minus padding and one column on either side
+    return width + 2 + margin.left + margin.right + padding.left + padding.right
+
+
+def bench_file(path: Path, name: str, width: int, rnd: random.Random, typo_rate: float, backspace_rate: float) -> dict:
+    sessionrepr = typo.SessionFileRepr.load_from_file(path)
+    stdscr = typo.init_virtual_screen(SCREEN_LINES, screen_cols(width))
+    session = typo.Session(stdscr, sessionrepr)
+    vscreen = stdscr.screen
+    text_width = session.sessionscreen.getmaxyx()[1] - 2
+    assert text_width == width, (text_width, width)
+
+    process, layout, layout_cold, render, cells = [], [], [], [], []
+    keys = 0
+    valid_inputs = typo.CONFIG.VALID_INPUTS
+    while True:
+        text = session.text
+        t = time.perf_counter_ns()
+        typo.TextLayout(text.display_text, width, text.replace(" "), text.replace("\n"))
+        layout_cold.append(time.perf_counter_ns() - t)
+
+        while not text.is_complete():
+            i = len(text.typed)
+            r = rnd.random()
+            t = time.perf_counter_ns()
+            if r < backspace_rate and i > 0:
+                session.type_backspace()
+            elif r < backspace_rate + typo_rate:
+                session.type_char(rnd.choice(valid_inputs))
+            else:
+                session.type_char(text.raw_text[i])
+            process.append(time.perf_counter_ns() - t)
+            keys += 1
+
+            t = time.perf_counter_ns()
+            text.get_layout(width)
+            text.position(len(text.typed), width)
+            layout.append(time.perf_counter_ns() - t)
+
+            t = time.perf_counter_ns()
+            session.draw_characters()
+            render.append(time.perf_counter_ns() - t)
+            cells.append(vscreen.last_update_cells)
+
+        if not session.has_next_section():
+            break
+        t = time.perf_counter_ns()
+        session.next_section()
+        process.append(time.perf_counter_ns() - t)
+
+    sections = session.typed_sections
+    return {
+        "file": name,
+        "width": width,
+        "sections": len(sections),
+        "chars": sum(len(s) for s in sections),
+        "max_section_chars": max(len(s) for s in sections),
+        "keys": keys,
+        "process_us": percentiles(process, US_PER_NS),
+        "layout_us": percentiles(layout, US_PER_NS),
+        "layout_cold_us": percentiles(layout_cold, US_PER_NS),
+        "render_us": percentiles(render, US_PER_NS),
+        "cells_per_frame": {"mean": statistics.fmean(cells) if cells else 0, "max": max(cells, default=0)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--res", type=Path, default=HERE / "res", help="directory with session files")
+    parser.add_argument("--widths", default="40,60,80,120,160,200", help="comma separated text widths")
+    parser.add_argument("--typo-rate", type=float, default=0.05)
+    parser.add_argument("--backspace-rate", type=float, default=0.03)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", type=Path, help="json file, default is stdout")
+    args = parser.parse_args()
+
+    random.seed(args.seed)  # load_from_file shuffles with the global generator
+    rnd = random.Random(args.seed)
+    widths = [int(w) for w in args.widths.split(",")]
+    files = sorted(p for p in args.res.rglob("*") if p.is_file() and typo.session_validate(str(p)))
+
+    results, skipped = [], []
+    for path in files:
+        name = str(path.relative_to(args.res))
+        for width in widths:
+            try:
+                r = bench_file(path, name, width, rnd, args.typo_rate, args.backspace_rate)
+            except ValueError as e:
+                # mostly words that don't fit into the width
+                skipped.append({"file": name, "width": width, "error": str(e)})
+                continue
+            results.append(r)
+            print(
+                f"{r['file']:<40} w={width:<4} keys={r['keys']:<6} "
+                f"process p99={r['process_us']['p99']:8.1f}us render p99={r['render_us']['p99']:8.1f}us",
+                file=sys.stderr,
+            )
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: str(v) for k, v in vars(args).items()},
+        },
+        "results": results,
+        "skipped": skipped,
+    }
+    out = json.dumps(report, indent=2)
+    if args.output is None:
+        print(out)
+    else:
+        args.output.write_text(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Helpers shared by the measurement scripts (bench.py, pty_latency.py) and the tests: loading
+main_3.0.py as a module and summarizing timing samples.
+
+Besides what main_3.0.py needs (pyyaml), these have optional dev dependencies that are not vendored:
+pytest for tests/ and the terminal emulator pyte for pty_latency.py:
+
+    pip install pytest pyte
+"""
+from __future__ import annotations
+
+import importlib.util
+import statistics
+import sys
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+
+def load_typo():
+    """main_3.0.py can't be imported by name; it is loaded once and registered as typo_main"""
+    if "typo_main" in sys.modules:
+        return sys.modules["typo_main"]
+    spec = importlib.util.spec_from_file_location("typo_main", HERE / "main_3.0.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["typo_main"] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentiles(samples: list, scale: float = 1.0) -> dict:
+    """n, p50/p95/p99 and max of samples, multiplied by scale"""
+    if not samples:
+        return {}
+    q = samples * 99 if len(samples) == 1 else statistics.quantiles(samples, n=100, method="inclusive")
+    return {"n": len(samples), "p50": q[49] * scale, "p95": q[94] * scale, "p99": q[98] * scale, "max": max(samples) * scale}
@@ -1,28 +1,44 @@
 from __future__ import annotations
-from collections import namedtuple
+from collections import namedtuple, Counter, OrderedDict, deque
 from dataclasses import dataclass, asdict
 from re import sub
-from typing import Type, List, NamedTuple, Union, Optional
+from typing import Type, List, NamedTuple, Union, Optional, Sequence, Iterable, Iterator, Tuple
 from textwrap import wrap
 
 import random
+from array import array
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 
 import curses
 import curses.textpad
+import functools
 
 
-from enum import Enum, auto
+from abc import ABC, abstractmethod
+from enum import Enum, IntEnum, auto
 
 from collections import namedtuple
 import os
+import selectors
+import sys
 import time
 from datetime import timedelta
 from typing import Text
 import yaml
 from pathlib import Path
 
+import argparse
+import atexit
+import hashlib
+import itertools
+import json
 import locale
 import logging
+import logging.handlers
+import marshal
+import queue
+import unicodedata
+import zlib
 
 from dataclasses import dataclass, asdict, replace
 
@@ -63,6 +79,350 @@ class WindowDimensions:
 #     bottomright: Optional[str | None]
 
 
+class ScreenBackend(ABC):  # {{{
+    """the module level curses functions the session and the picker use, windows are passed around directly"""
+
+    @abstractmethod
+    def newpad(self, nlines: int, ncols: int):
+        ...
+
+    @abstractmethod
+    def newwin(self, nlines: int, ncols: int, begin_y: int, begin_x: int):
+        ...
+
+    @abstractmethod
+    def doupdate(self):
+        ...
+
+    @abstractmethod
+    def setsyx(self, y: int, x: int):
+        """where the cursor goes on the next doupdate"""
+
+    @abstractmethod
+    def curs_set(self, visibility: int):
+        ...
+
+    @abstractmethod
+    def use_default_colors(self):
+        ...
+
+    @abstractmethod
+    def init_pair(self, pair_number: int, fg: int, bg: int):
+        ...
+
+    @abstractmethod
+    def color_pair(self, pair_number: int) -> int:
+        ...
+
+
+class CursesBackend(ScreenBackend):
+    def newpad(self, nlines: int, ncols: int):
+        return curses.newpad(nlines, ncols)
+
+    def newwin(self, nlines: int, ncols: int, begin_y: int, begin_x: int):
+        return curses.newwin(nlines, ncols, begin_y, begin_x)
+
+    def doupdate(self):
+        curses.doupdate()
+
+    def setsyx(self, y: int, x: int):
+        curses.setsyx(y, x)
+
+    def curs_set(self, visibility: int):
+        curses.curs_set(visibility)
+
+    def use_default_colors(self):
+        curses.use_default_colors()
+
+    def init_pair(self, pair_number: int, fg: int, bg: int):
+        curses.init_pair(pair_number, fg, bg)
+
+    def color_pair(self, pair_number: int) -> int:
+        return curses.color_pair(pair_number)
+
+
+CURSES_BACKEND = CursesBackend()
+
+
+class VirtualScreen(ScreenBackend):
+    """
+    in-memory terminal for running the session and the picker without a tty. Windows are VirtualWindow
+    objects that mimic the parts of the curses window api used here; doupdate copies the composed screen
+    into the 'physical' cells and counts how many of them changed.
+    """
+
+    BLANK = (" ", 0)
+
+    def __init__(self, nlines: int, ncols: int) -> None:
+        self.nlines = nlines
+        self.ncols = ncols
+        self.newscr = [[self.BLANK] * ncols for _ in range(nlines)]
+        self.cells = [[self.BLANK] * ncols for _ in range(nlines)]
+        self.cursor = (0, 0)
+        self.cursor_visibility = 1
+        self.pairs = {}
+        self.input = deque()
+        self.calls = Counter()  # curses calls by name, on windows and on the backend
+        self.updates = 0
+        self.last_update_cells = 0  # cells changed by the last doupdate
+        self.stdscr = VirtualWindow(self, nlines, ncols, 0, 0)
+
+    def feed(self, keys: Sequence[Union[str, int]]):
+        """queue keys for get_wch, str keys are split into chars"""
+        for k in keys:
+            self.input.extend(k if isinstance(k, str) else [k])
+
+    def reset_counts(self):
+        self.calls.clear()
+        self.updates = 0
+        self.last_update_cells = 0
+
+    def newpad(self, nlines: int, ncols: int) -> VirtualWindow:
+        self.calls["newpad"] += 1
+        return VirtualWindow(self, nlines, ncols, 0, 0, is_pad=True)
+
+    def newwin(self, nlines: int, ncols: int, begin_y: int, begin_x: int) -> VirtualWindow:
+        self.calls["newwin"] += 1
+        if begin_y < 0 or begin_x < 0 or begin_y + nlines > self.nlines or begin_x + ncols > self.ncols:
+            raise curses.error("newwin() returned NULL")
+        return VirtualWindow(self, nlines, ncols, begin_y, begin_x)
+
+    def setsyx(self, y: int, x: int):
+        self.cursor = (y, x)
+
+    def doupdate(self):
+        self.calls["doupdate"] += 1
+        changed = 0
+        for y in range(self.nlines):
+            new, old = self.newscr[y], self.cells[y]
+            if new != old:
+                changed += sum(1 for a, b in zip(new, old) if a != b)
+                self.cells[y] = list(new)
+        self.updates += 1
+        self.last_update_cells = changed
+
+    def curs_set(self, visibility: int):
+        self.calls["curs_set"] += 1
+        self.cursor_visibility = visibility
+
+    def use_default_colors(self):
+        self.calls["use_default_colors"] += 1
+
+    def init_pair(self, pair_number: int, fg: int, bg: int):
+        self.calls["init_pair"] += 1
+        self.pairs[pair_number] = (fg, bg)
+
+    def color_pair(self, pair_number: int) -> int:
+        return pair_number << 8
+
+    def lines(self) -> List[str]:
+        """text of the 'physical' screen"""
+        return ["".join(c for c, _ in row) for row in self.cells]
+
+    def attr(self, y: int, x: int) -> int:
+        return self.cells[y][x][1]
+
+
+class VirtualWindow:
+    """window or pad of a VirtualScreen; subwindows share the cells of their parent like curses subwin"""
+
+    def __init__(
+        self,
+        screen: VirtualScreen,
+        nlines: int,
+        ncols: int,
+        begin_y: int,
+        begin_x: int,
+        parent: Optional[VirtualWindow] = None,
+        is_pad: bool = False,
+    ) -> None:
+        self.screen = screen
+        self.nlines, self.ncols = nlines, ncols
+        self.begin_y, self.begin_x = begin_y, begin_x
+        self.is_pad = is_pad
+        if parent is None:
+            self.cells = [[VirtualScreen.BLANK] * ncols for _ in range(nlines)]
+            self.off_y, self.off_x = 0, 0
+        else:
+            self.cells = parent.cells
+            self.off_y, self.off_x = parent.off_y + begin_y - parent.begin_y, parent.off_x + begin_x - parent.begin_x
+        self.cury, self.curx = 0, 0
+        self.attr = 0
+        self.delay = -1  # ms get_wch waits for input, negative blocks
+        self.touched = set(range(nlines))
+        self.leave = False
+        self.scroll_ok = False
+        self.scroll_region = (0, nlines - 1)
+
+    def count(self, name: str):
+        self.screen.calls[name] += 1
+
+    def getmaxyx(self) -> tuple[int, int]:
+        return self.nlines, self.ncols
+
+    def getbegyx(self) -> tuple[int, int]:
+        return self.begin_y, self.begin_x
+
+    def getyx(self) -> tuple[int, int]:
+        return self.cury, self.curx
+
+    def attrset(self, attr: int):
+        self.attr = attr
+
+    def keypad(self, flag: bool):
+        pass
+
+    def nodelay(self, flag: bool):
+        self.delay = 0 if flag else -1
+
+    def timeout(self, delay: int):
+        self.delay = delay
+
+    def leaveok(self, flag: bool):
+        self.leave = flag
+
+    def idlok(self, flag: bool):
+        pass
+
+    def scrollok(self, flag: bool):
+        self.scroll_ok = flag
+
+    def setscrreg(self, top: int, bottom: int):
+        if not 0 <= top <= bottom < self.nlines:
+            raise curses.error("wsetscrreg() returned ERR")
+        self.scroll_region = (top, bottom)
+
+    def scroll(self, n: int = 1):
+        """move the lines of the scroll region up by n, down if n is negative"""
+        self.count("scroll")
+        if not self.scroll_ok:
+            raise curses.error("scroll() returned ERR")
+        top, bottom = self.scroll_region
+        rows = [self.cells[self.off_y + y][self.off_x : self.off_x + self.ncols] for y in range(top, bottom + 1)]
+        blank = [VirtualScreen.BLANK] * self.ncols
+        if n >= 0:
+            rows = rows[n:] + [blank] * min(n, len(rows))
+        else:
+            rows = [blank] * min(-n, len(rows)) + rows[:n]
+        for y, row in zip(range(top, bottom + 1), rows):
+            self.cells[self.off_y + y][self.off_x : self.off_x + self.ncols] = row
+        self.touched.update(range(top, bottom + 1))
+
+    def subwin(self, nlines: int, ncols: int, begin_y: int, begin_x: int) -> VirtualWindow:
+        self.count("subwin")
+        if begin_y + nlines > self.begin_y + self.nlines or begin_x + ncols > self.begin_x + self.ncols:
+            raise curses.error("subwin() returned NULL")
+        return VirtualWindow(self.screen, nlines, ncols, begin_y, begin_x, parent=self)
+
+    def move(self, y: int, x: int):
+        if not (0 <= y < self.nlines and 0 <= x < self.ncols):
+            raise curses.error("wmove() returned ERR")
+        self.cury, self.curx = y, x
+
+    def put(self, y: int, x: int, s: str, attr: int):
+        """write s with wrapping at the right edge; like curses, running out of window is an error"""
+        self.move(y, x)
+        for c in s:
+            self.cells[self.off_y + y][self.off_x + x] = (c, attr)
+            self.touched.add(y)
+            x += 1
+            if x == self.ncols:
+                if y + 1 == self.nlines:
+                    raise curses.error("addwstr() returned ERR")
+                y, x = y + 1, 0
+        self.cury, self.curx = y, x
+
+    def addstr(self, *args):
+        self.count("addstr")
+        if len(args) <= 2:
+            args = (self.cury, self.curx) + args
+        y, x, s = args[:3]
+        self.put(y, x, s, args[3] if len(args) > 3 else self.attr)
+
+    def addch(self, *args):
+        self.count("addch")
+        if len(args) <= 2:
+            args = (self.cury, self.curx) + args
+        y, x, c = args[:3]
+        self.put(y, x, c if isinstance(c, str) else chr(c), args[3] if len(args) > 3 else self.attr)
+
+    def inch(self, y: int, x: int) -> int:
+        c, attr = self.cells[self.off_y + y][self.off_x + x]
+        return ord(c) | attr
+
+    def instr(self, y: int, x: int, n: Optional[int] = None) -> bytes:
+        row = self.cells[self.off_y + y][self.off_x + x : self.off_x + self.ncols]
+        return "".join(c for c, _ in row[:n]).encode()
+
+    def erase(self):
+        self.count("erase")
+        for y in range(self.nlines):
+            self.cells[self.off_y + y][self.off_x : self.off_x + self.ncols] = [VirtualScreen.BLANK] * self.ncols
+        self.touched.update(range(self.nlines))
+
+    clear = erase
+
+    def touchwin(self):
+        self.touched.update(range(self.nlines))
+
+    def border(self):
+        self.count("border")
+        h, w = self.nlines, self.ncols
+        row = self.cells
+        for x in range(1, w - 1):
+            row[self.off_y][self.off_x + x] = ("─", self.attr)
+            row[self.off_y + h - 1][self.off_x + x] = ("─", self.attr)
+        for y in range(1, h - 1):
+            row[self.off_y + y][self.off_x] = ("│", self.attr)
+            row[self.off_y + y][self.off_x + w - 1] = ("│", self.attr)
+        for (y, x), c in zip(((0, 0), (0, w - 1), (h - 1, 0), (h - 1, w - 1)), "┌┐└┘"):
+            row[self.off_y + y][self.off_x + x] = (c, self.attr)
+        self.touched.update(range(h))
+
+    def noutrefresh(self, *args):
+        self.count("noutrefresh")
+        newscr = self.screen.newscr
+        if self.is_pad:
+            pminrow, pmincol, sminrow, smincol, smaxrow, smaxcol = args
+            for dy in range(smaxrow - sminrow + 1):
+                row = self.cells[pminrow + dy]
+                newscr[sminrow + dy][smincol : smaxcol + 1] = row[pmincol : pmincol + smaxcol - smincol + 1]
+            cursor = (self.cury - pminrow + sminrow, self.curx - pmincol + smincol)
+        else:
+            for y in self.touched:
+                newscr[self.begin_y + y][self.begin_x : self.begin_x + self.ncols] = self.cells[self.off_y + y][
+                    self.off_x : self.off_x + self.ncols
+                ]
+            cursor = (self.begin_y + self.cury, self.begin_x + self.curx)
+        self.touched.clear()
+        if not self.leave:
+            self.screen.cursor = cursor
+
+    def refresh(self, *args):
+        self.noutrefresh(*args)
+        self.screen.doupdate()
+
+    def get_wch(self):
+        self.count("get_wch")
+        if not self.is_pad:
+            self.refresh()
+        if not self.screen.input:
+            if self.delay < 0:
+                # nothing can be typed into a virtual screen, curses would wait forever
+                raise curses.error("no input")
+            time.sleep(self.delay / 1000)
+            raise curses.error("no input within timeout")
+        return self.screen.input.popleft()
+
+
+# }}}
+
+
+def backend_for(window) -> ScreenBackend:
+    """VirtualWindows bring their own backend, everything else is a real curses window"""
+    return window.screen if isinstance(window, VirtualWindow) else CURSES_BACKEND
+
+
 @dataclass(frozen=True)
 class ColorScheme:
     def __init__(
@@ -72,42 +432,45 @@ class ColorScheme:
         wrong: tuple[int, int],
         border: tuple[int, int],
         accent: tuple[int, int],
+        backend: ScreenBackend = CURSES_BACKEND,
     ) -> None:
-        curses.use_default_colors()
-        curses.init_pair(1, *fg)
-        curses.init_pair(2, *correct)
-        curses.init_pair(3, *wrong)
-        curses.init_pair(4, *border)
-        curses.init_pair(5, *accent)
+        object.__setattr__(self, "backend", backend)
+        backend.use_default_colors()
+        backend.init_pair(1, *fg)
+        backend.init_pair(2, *correct)
+        backend.init_pair(3, *wrong)
+        backend.init_pair(4, *border)
+        backend.init_pair(5, *accent)
 
     @property
     def fg(self):
-        return curses.color_pair(1)
+        return self.backend.color_pair(1)
 
     @property
     def correct(self):
-        return curses.color_pair(2)
+        return self.backend.color_pair(2)
 
     @property
     def wrong(self):
-        return curses.color_pair(3)
+        return self.backend.color_pair(3)
 
     @property
     def border(self):
-        return curses.color_pair(4)
+        return self.backend.color_pair(4)
 
     @property
     def accent(self):
-        return curses.color_pair(5)
+        return self.backend.color_pair(5)
 
     @classmethod
-    def default(cls):
+    def default(cls, backend: ScreenBackend = CURSES_BACKEND):
         return ColorScheme(
             fg=(-1, -1),  # default
             correct=(curses.COLOR_GREEN, -1),
             wrong=(curses.COLOR_RED, -1),
             border=(-1, -1),
             accent=(curses.COLOR_YELLOW, -1),
+            backend=backend,
         )
 
 
@@ -123,6 +486,13 @@ class SessionSettings:
     ACC_WINDOW: WindowDimensions
     COLOR_SCHEME: Optional[ColorScheme]
     MAX_WIDTH: int
+    STATS_INTERVAL: float  # seconds between wpm/accuracy updates while idle
+    MAX_FPS: int  # upper limit for frames drawn per second, 0 draws every batch of keys
+    PROFILE: bool  # collect timings for the F2 overlay and the summary in typo.log
+    HUD_WINDOW: WindowDimensions  # the F2 overlay, active means it is shown from the start
+    TEXT_SECTION_CHARS: int  # plain text files are cut into sections of about this many chars
+    TEXT_WORD_CHARS: int  # longer words in plain text files are cut into pieces, so a narrow window can wrap them
+    SHUFFLE_BUFFER: int  # sections held back to shuffle a streamed source, more is more random
 
     @property
     def replacements(self):
@@ -142,6 +512,7 @@ class SessionSettings:
         border_padding = WindowSpacing(left=3, right=3, top=1, bottom=1)
         wpm_window = WindowDimensions(active=True, nlines=3, ncols=9, window_spacing=WindowSpacing(left=None, right=1, top=1, bottom=None))
         acc_window = WindowDimensions(active=True, nlines=3, ncols=9, window_spacing=WindowSpacing(left=None, right=1, top=None, bottom=1))
+        hud_window = WindowDimensions(active=False, nlines=16, ncols=42, window_spacing=WindowSpacing(left=None, right=11, top=1, bottom=None))
 
         return SessionSettings(
             VALID_INPUTS=valid_inputs,
@@ -154,6 +525,13 @@ class SessionSettings:
             ACC_WINDOW=acc_window,
             COLOR_SCHEME=None,  # TODO: not none
             MAX_WIDTH=120,
+            STATS_INTERVAL=0.5,
+            MAX_FPS=60,
+            PROFILE=True,
+            HUD_WINDOW=hud_window,
+            TEXT_SECTION_CHARS=400,
+            TEXT_WORD_CHARS=40,
+            SHUFFLE_BUFFER=256,
         )
 
 
@@ -162,17 +540,155 @@ CONFIG = SessionSettings.default()
 # window_information = namedtuple("window_information", ["window", "callback"])
 
 # Default logging setup
+# Records only go into a queue on the calling thread, a listener thread writes them to the file. Debug
+# messages are written for every key and frame, set TYPO_LOG_LEVEL=DEBUG to get them.
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-log_filehandler = logging.FileHandler(
+log_level = os.environ.get("TYPO_LOG_LEVEL", "INFO").upper()
+log_level_unknown = False
+try:
+    logger.setLevel(log_level)
+except ValueError:
+    logger.setLevel(logging.INFO)
+    log_level_unknown = True  # warned about once the handler is set up
+log_filehandler = logging.handlers.RotatingFileHandler(
     "typo.log",
-    mode="w",
-    delay=False,
+    maxBytes=1 << 20,
+    backupCount=2,
+    delay=True,
 )
 log_formatter = logging.Formatter(fmt=f"%(asctime)s [%(levelname)-8s] %(message)s", datefmt="[%H:%M:%S]")
 log_filehandler.setFormatter(log_formatter)
+log_queue = queue.SimpleQueue()
+log_listener = logging.handlers.QueueListener(log_queue, log_filehandler)
 logger.handlers.clear()
-logger.addHandler(log_filehandler)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener.start()
+# stop() writes what is still queued
+atexit.register(log_listener.stop)
+if log_level_unknown:
+    logger.warning("Unknown TYPO_LOG_LEVEL %r, logging at INFO", log_level)
+
+
+def init_worker_logging():
+    """
+    initializer for worker processes: a forked worker inherits the queue handler but not the listener
+    thread, so its records would never be written. Workers append to the log file directly instead.
+    """
+    handler = logging.FileHandler(log_filehandler.baseFilename, delay=True)
+    handler.setFormatter(log_formatter)
+    logger.handlers.clear()
+    logger.addHandler(handler)
+
+
+class TimingHistogram:  # {{{
+    """durations in ns, 4 buckets per power of two so recording one is a few integer operations"""
+
+    def __init__(self) -> None:
+        self.counts = array("Q", bytes(8 * 4 * 65))
+        self.n = 0
+        self.total = 0
+        self.max = 0
+
+    @staticmethod
+    def bucket(ns: int) -> int:
+        b = ns.bit_length()
+        return ns if b < 3 else (b << 2) | ((ns >> (b - 3)) & 3)
+
+    @staticmethod
+    def bucket_end(i: int) -> int:
+        """first duration that doesn't fall into bucket i any more"""
+        if i < 4:
+            return i + 1
+        b = i >> 2
+        return ((4 | (i & 3)) + 1) << (b - 3)
+
+    def add(self, ns: int):
+        self.counts[self.bucket(ns)] += 1
+        self.n += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def percentile(self, q: float) -> int:
+        """upper bound of the q-th percentile (0 < q <= 100), at most 25% too high"""
+        target = max(1, -(-self.n * q // 100))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return min(self.bucket_end(i), self.max)
+        return self.max
+
+
+# }}}
+
+
+def format_ns(ns: float) -> str:
+    if ns < 1e3:
+        return f"{ns:.0f}ns"
+    elif ns < 1e6:
+        return f"{ns / 1e3:.1f}µs"
+    return f"{ns / 1e6:.1f}ms"
+
+
+class Profiler:  # {{{
+    """timing histograms of the draw and input paths, shown by the F2 overlay and logged on exit"""
+
+    def __init__(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self.histograms = {}  # name -> TimingHistogram, in the order they were registered
+
+    def histogram(self, name: str) -> TimingHistogram:
+        if name not in self.histograms:
+            self.histograms[name] = TimingHistogram()
+        return self.histograms[name]
+
+    def record(self, name: str, ns: int):
+        if self.enabled:
+            self.histogram(name).add(ns)
+
+    def timed(self, name: str):
+        """decorator, records every call of the function under name"""
+
+        def decorate(fn):
+            hist = self.histogram(name)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                t = time.perf_counter_ns()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    hist.add(time.perf_counter_ns() - t)
+
+            return wrapper
+
+        return decorate
+
+    def table(self) -> List[str]:
+        """one row per histogram that has samples, columns fit into the HUD window"""
+        rows = [f"{'':<10}{'n':>6}{'p50':>8}{'p99':>8}{'max':>8}"]
+        for name, h in self.histograms.items():
+            if h.n:
+                rows.append(f"{name[:10]:<10}{h.n:>6}{format_ns(h.percentile(50)):>8}{format_ns(h.percentile(99)):>8}{format_ns(h.max):>8}")
+        return rows
+
+    def summary(self) -> List[str]:
+        lines = []
+        for name, h in self.histograms.items():
+            if h.n:
+                lines.append(
+                    f"{name:<14} n={h.n:<8} mean={format_ns(h.total / h.n):<8} p50={format_ns(h.percentile(50)):<8} "
+                    f"p95={format_ns(h.percentile(95)):<8} p99={format_ns(h.percentile(99)):<8} max={format_ns(h.max)}"
+                )
+        return lines
+
+
+# }}}
+
+PROFILER = Profiler(enabled=CONFIG.PROFILE)
 
 
 teststring = 'Mr. Stubb," said I, turning to that worthy, who, buttoned up in his oil-jacket, was now calmly smoking his pipe in the rain; '
@@ -186,6 +702,15 @@ B_DOUBLE = ("║", "║", "═", "═", "╔", "╗", "╚", "╝")
 
 CHARACTERS_PER_WORD = 5
 
+KEYLOG_PATH = "typo.keys"
+RES_PATH = "./typo/res/"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "typo"
+SESSION_CACHE_DIR = CACHE_DIR / "sessions"
+SESSION_CACHE_VERSION = 1
+SESSION_CACHE_MAX_BYTES = 64 << 20  # least recently used blobs are deleted above this, see prune_session_cache
+# libyaml is a lot faster than the pure python loader, if pyyaml was built with it
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 WINDOWS_TO_REFRESH = {}
 
 
@@ -204,14 +729,143 @@ class TypoError:  # {{{
 # }}}
 
 
+@dataclass(frozen=True)
+class LayoutLine:  # {{{
+    """one wrapped line of display text; behaves like the char list it replaces"""
+
+    start: int  # offset of the first char in the display text
+    text: str
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __iter__(self):
+        return iter(self.text)
+
+    def __getitem__(self, i):
+        return self.text[i]
+
+
+# }}}
+
+
+class TextLayout:  # {{{
+    """display text wrapped to a fixed width, computed once and never changed afterwards"""
+
+    def __init__(self, display_text: str, width: int, space: str, newline: str) -> None:
+        self.width = width
+        self.length = len(display_text)
+        self.lines = self.wrap(display_text, width, space, newline)
+        # line number of every display cell, so positions can be looked up without searching
+        self.cell_line = array("I")
+        for n, l in enumerate(self.lines):
+            self.cell_line.extend([n] * len(l))
+
+    def locate(self, d: int) -> tuple[int, int]:
+        """line and column of display cell d; the end of the text is located behind the last char"""
+        if d >= self.length:
+            if not self.lines:
+                return 0, 0
+            return len(self.lines) - 1, len(self.lines[-1])
+        line = self.cell_line[d]
+        return line, d - self.lines[line].start
+
+    @staticmethod
+    def wrap(display_text: str, width: int, space: str, newline: str) -> tuple[LayoutLine, ...]:
+        """split text into lines not longer than width; joined together the lines give back the input"""
+        lines = []
+        line_start = 0
+        word_start = 0
+        n = len(display_text)
+        while word_start < n:
+            # a word includes its trailing space or newline symbol
+            word_end = word_start
+            while word_end < n and display_text[word_end] != space and display_text[word_end] != newline:
+                word_end += 1
+            if word_end < n:
+                word_end += 1
+            if word_end - word_start > width:
+                raise ValueError(f"Can't fit <{display_text[word_start:word_end]}> (plus possible space) in a width of {width}!")
+            if word_end - line_start > width:
+                # line + word to long -> new line
+                lines.append(LayoutLine(line_start, display_text[line_start:word_start]))
+                line_start = word_start
+            if display_text[word_end - 1] == newline:
+                lines.append(LayoutLine(line_start, display_text[line_start:word_end]))
+                line_start = word_end
+            word_start = word_end
+        if line_start < n:
+            lines.append(LayoutLine(line_start, display_text[line_start:]))
+        return tuple(lines)
+
+
+# }}}
+
+
+class LayoutCache:  # {{{
+    """small lru cache for TextLayout, keyed by (display text, width)"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.layouts: OrderedDict[tuple[str, int], TextLayout] = OrderedDict()
+
+    def get(self, display_text: str, width: int, space: str, newline: str) -> TextLayout:
+        key = (display_text, width)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.layouts.move_to_end(key)
+            return layout
+        layout = TextLayout(display_text, width, space, newline)
+        self.layouts[key] = layout
+        if len(self.layouts) > self.maxsize:
+            self.layouts.popitem(last=False)
+        return layout
+
+
+# }}}
+
+
+# a few widths per section are enough for the current and previous section plus resizes
+LAYOUT_CACHE = LayoutCache(maxsize=16)
+
+
+class TextPosition(NamedTuple):
+    line: int
+    column: int
+    expected: str
+
+
+class CharState(IntEnum):
+    UNTYPED = 0
+    CORRECT = 1
+    WRONG = 2
+
+
 class SessionTextObject:  # {{{
     """data modell for the text in one session. includes the 'normal' guide text as well as typed input"""
 
     def __init__(self, text: str) -> None:
         self.raw_text = text
         self.replacements = CONFIG.replacements
-
-        self.typed = []  # simple char buffer
+        self.display_text = self.display_mode()
+        # display_offsets[i] is the first display cell of raw char i, display_owner[d] the raw char shown in cell d
+        self.display_offsets = array("I", [0])
+        self.display_owner = array("I")
+        for i, c in enumerate(self.raw_text):
+            n = len(self.replace(c))
+            self.display_owner.extend([i] * n)
+            self.display_offsets.append(self.display_offsets[-1] + n)
+
+        self.typed = []  # simple char buffer, raw chars as typed
+        self.states = bytearray(len(self.raw_text))  # one CharState per raw char
+        # running totals, kept in sync by type_char/type_backspace
+        self.n_correct = 0
+        self.n_wrong = 0
+        self.dirty = set()  # raw chars changed since the last frame
         self.corrected_errors = []
 
     def is_complete(self):
@@ -231,166 +885,163 @@ class SessionTextObject:  # {{{
             buf = buf.replace(k, v)
         return buf
 
-    def completed_chars(self) -> List[str]:
-        complete = self.get_typed_chars(256, correct=True, typos=True)
-        complete = [x for c in complete for x in c]
-        return complete
-
-    def correct_chars(self) -> List[str]:
-        correct = self.get_typed_chars(256, correct=True, typos=False)
-        correct = [x for c in correct for x in c]
-        return correct
+    def completed_count(self) -> int:
+        return self.n_correct + self.n_wrong
 
     def get_accuracy(self) -> float:
-        """return accuracy of typed characters"""
-        complete = self.completed_chars()
-        correct = self.correct_chars()
-        count = 0
-        # Compare all typed characters to the wrongly typed ones
-        for a, c in zip(complete, correct):
-            if a == c:
-                count += 1  # this one is correct
-        return (count / (len(complete) + len(self.corrected_errors))) * 100 if len(complete) > 0 else 100.0
-
-    def get_typed_chars(self, width, correct: bool = True, typos: bool = True) -> List[List[str]]:
-        """format typed chars in the same way as"""
-        formated_chars = []
-        last_index = 0
-        # TODO: this should also be performed by the same function as for raw_text
-        buf = self.typed
-        get_guide_chars = self.get_guide_chars(width)
-        for i, c in enumerate(buf):
-            buf[i] = self.replace(c)
-        # TODO: fix for replacing one char with multiple chars: concat inner lists
-        buf = [c for x in buf for c in x]
-
-        # iterate through all characters in buffer and compare with get_guide_chars
-        for nline, l in enumerate(get_guide_chars):
-            if len(buf[last_index:]) > len(l):
-                # to_append = [c for c in buf[last_index:last_index+len(l)]]
-                to_append = []
-                for i, c in enumerate(buf[last_index : last_index + len(l)]):
-                    # check if correct, and if correct/typos should be returned
-                    if c == get_guide_chars[nline][i]:
-                        if correct:
-                            to_append.append(c)
-                        else:
-                            to_append.append("")
-                    else:
-                        if typos:
-                            to_append.append(c)
-                        else:
-                            to_append.append("")
-                formated_chars.append(to_append)
-                last_index = last_index + len(l)
-            else:
-                to_append = []
-                for i, c in enumerate(buf[last_index:]):
-                    # check if correct, and if correct/typos should be returned
-                    if c == get_guide_chars[nline][i]:
-                        if correct:
-                            to_append.append(c)
-                        else:
-                            to_append.append("")
-                    else:
-                        if typos:
-                            to_append.append(c)
-                        else:
-                            to_append.append("")
-                formated_chars.append(to_append)
-                last_index = len(buf)
-        return formated_chars
-
-    def type_char(self, c: str):
-        """type one character"""
+        """return accuracy of typed characters, corrected typos still count as errors"""
+        complete = self.completed_count()
+        return (self.n_correct / (complete + len(self.corrected_errors))) * 100 if complete > 0 else 100.0
+
+    def cell(self, d: int) -> tuple[str, CharState]:
+        """char and state of display cell d; wrong cells show what was typed instead of the guide char"""
+        i = self.display_owner[d]
+        state = self.states[i]
+        if state == CharState.WRONG:
+            typed = self.replace(self.typed[i])
+            k = d - self.display_offsets[i]
+            if k < len(typed):
+                return typed[k], CharState.WRONG
+        return self.display_text[d], CharState(state)
+
+    def typed_cells(self) -> int:
+        """number of display cells covered by typed chars, aka the cursor position in the display text"""
+        return self.display_offsets[len(self.typed)]
+
+    def type_char(self, c: str) -> CharState:
+        """type one character, returns whether it was correct"""
         if len(c) != 1:
             raise ValueError("Expected char in put, aka string with length 1!")
+        i = len(self.typed)
+        state = CharState.UNTYPED
+        if i < len(self.raw_text):
+            self.dirty.add(i)
+            if c == self.raw_text[i]:
+                state = CharState.CORRECT
+                self.n_correct += 1
+            else:
+                state = CharState.WRONG
+                self.n_wrong += 1
+            self.states[i] = state
         self.typed.append(c)
+        return state
 
-    def type_backspace(self):
-        """remove on character"""
+    def type_backspace(self) -> CharState:
+        """remove on character, returns the state the removed char had"""
+        state = CharState.UNTYPED
         if len(self.typed) >= 1:
-            # Get both character buffer, find correct position and compare char; 1024 is just a random number
-            typed_chars = self.get_typed_chars(1024)
-            l = len([sublist for sublist in typed_chars if sublist != []]) - 1
-            c = len([x for x in typed_chars[l] if x != ""]) - 1
-            c_typed = typed_chars[l][c]
-            c_actual = self.get_guide_chars(1024)[l][c]
-            if c_typed != c_actual:
-                self.corrected_errors.append(TypoError(char=c_actual, tipped=c_typed, corrected=True))
-                logger.info(f"Created TypoErro: {self.corrected_errors[-1]}")
+            i = len(self.typed) - 1
+            if i < len(self.raw_text):
+                state = CharState(self.states[i])
+                if state == CharState.WRONG:
+                    c_typed, c_actual = self.replace(self.typed[i]), self.replace(self.raw_text[i])
+                    self.corrected_errors.append(TypoError(char=c_actual, tipped=c_typed, corrected=True))
+                    logger.debug("Created TypoErro: %s", self.corrected_errors[-1])
+                    self.n_wrong -= 1
+                elif state == CharState.CORRECT:
+                    self.n_correct -= 1
+                self.states[i] = CharState.UNTYPED
+                self.dirty.add(i)
             self.typed.pop()
+        return state
 
-    def get_guide_chars(self, width: int) -> List[List[str]]:
-        """fill a string with spaces and linebreaks so it fits into the given width"""
-        """returns list of text, splitted into lines not longer than width"""
-
-        # TODO: iterate through complete string as a char buffer
-        # buf = self.display_mode()
-        # lines = []
-        # last_valid_break = 0
-        # last_word_break = 0
-        # for i,c in enumerate(buf):
-        #     if c == self.replace("\n"):
-        #         line = buf[last_valid_break:i+1]
-        #         last_valid_break = i+1
-        #         last_word_break = last_valid_break
-        #         if len(line) > width:
-        #             raise ValueError(f"line too long: {line}")
-        #         else:
-        #             lines.append(line)
-        #     else:
-
-        tmp_lst = self.display_mode().split(self.replace(" "))
-        # also split at newline character
-        l = []
-        for w in tmp_lst:
-            if self.replace("\n") in w:
-                w_l = w.split(self.replace("\n"))
-                w_l = [u + self.replace("\n") for u in w_l[:-1]] + [w_l[-1]]
-                l.extend(w_l)
-            else:
-                l.append(w)
-        tmp_lst = l
-
-        # logger.debug(tmp_lst)
-        ret_lst = []
-        current_lst = []
-
-        for i, word in enumerate(tmp_lst):
-
-            if len(word) > width or (len(word) + 1 > width and len(tmp_lst) > 1):
-                # this word (and 1 space) doesn't fit at all if there are at least 2 words there must be place for 1 space
-                raise ValueError(f"Can't fit <{word}> (plus possible space) in a width of {width}!")
-
-            # check if we have a newline in the last added part, mind the space
-            if len(current_lst) > 1 and (current_lst[-1] == self.replace(" ") and current_lst[-2] == self.replace("\n")):
-                # Stip space after newline
-                ret_lst.append(current_lst[:-1])
-                current_lst = []
-
-            # if it's the last word we need no space at the end
-            # +1 for space after word
-            if (len(current_lst) + len(word) + 1 > width and i + 1 != len(tmp_lst)) or (
-                len(current_lst) + len(word) > width and i + 1 == len(tmp_lst)
-            ):
-                # line + word to long -> new line
-                ret_lst.append(current_lst)
-                current_lst = []
+    def expected_char(self, i: int) -> str:
+        return self.raw_text[i] if i < len(self.raw_text) else ""
+
+    @PROFILER.timed("position")
+    def position(self, i: int, width: int) -> TextPosition:
+        """where raw char i is shown when wrapped to width; i == len(raw_text) is the position behind the text"""
+        line, column = self.get_layout(width).locate(self.display_offsets[i])
+        return TextPosition(line=line, column=column, expected=self.expected_char(i))
 
-            current_lst.extend(word)
-            if tmp_lst[-1] != word:
-                # add spaces between words and the last word aswell
-                current_lst.extend(self.replace(" "))
+    @PROFILER.timed("layout")
+    def get_layout(self, width: int) -> TextLayout:
+        """wrapped lines for the given width, only computed on the first call per width"""
+        return LAYOUT_CACHE.get(self.display_text, width, self.replace(" "), self.replace("\n"))
 
-        if len(current_lst) != 0:
-            ret_lst.append(current_lst)
-        # logger.debug(ret_lst)
-        return ret_lst
+    @PROFILER.timed("guide_chars")
+    def get_guide_chars(self, width: int) -> tuple[LayoutLine, ...]:
+        """returns the text, splitted into lines not longer than width"""
+        return self.get_layout(width).lines
 
     # }}}
 
 
+class KeyOutcome(IntEnum):
+    CORRECT = 0
+    WRONG = 1
+    BACKSPACE = 2  # removed a correct char (or nothing)
+    CORRECTION = 3  # removed a wrong char
+
+
+BACKSPACE_CODE = 0x7F  # stored as key for backspace events
+
+
+class KeystrokeLog:  # {{{
+    """
+    every key typed in a session with its monotonic timestamp, stored column wise in arrays
+    (17 bytes per key) instead of one python object per key
+    """
+
+    VERSION = 1
+    COLUMNS = ("t_ns", "key", "expected", "outcome", "section_starts")
+
+    def __init__(self, t_start_ns: Optional[int] = None) -> None:
+        self.t_start_ns = time.monotonic_ns() if t_start_ns is None else t_start_ns
+        self.t_ns = array("q")  # time.monotonic_ns() when the key was read
+        self.key = array("I")  # code point of the typed char, BACKSPACE_CODE for backspace
+        self.expected = array("I")  # code point of the char at the cursor position, 0 behind the text
+        self.outcome = array("B")  # KeyOutcome
+        self.section_starts = array("I")  # index of the first event of every section
+
+    def __len__(self) -> int:
+        return len(self.t_ns)
+
+    def start_section(self):
+        self.section_starts.append(len(self.t_ns))
+
+    def record(self, t_ns: int, key: str, expected: str, outcome: KeyOutcome):
+        self.t_ns.append(t_ns)
+        self.key.append(BACKSPACE_CODE if outcome in (KeyOutcome.BACKSPACE, KeyOutcome.CORRECTION) else ord(key))
+        self.expected.append(ord(expected) if expected else 0)
+        self.outcome.append(outcome)
+
+    def nbytes(self) -> int:
+        return sum(a.itemsize * len(a) for a in (self.t_ns, self.key, self.expected, self.outcome, self.section_starts))
+
+    def save(self, path, sections: List[str]):
+        """one json header line with the section texts, followed by the raw columns"""
+        columns = [getattr(self, c) for c in self.COLUMNS]
+        header = {
+            "version": self.VERSION,
+            "byteorder": sys.byteorder,
+            "t_start_ns": self.t_start_ns,
+            "sections": sections,
+            "lengths": [len(a) for a in columns],
+        }
+        with open(path, "wb") as f:
+            f.write(json.dumps(header).encode() + b"\n")
+            for a in columns:
+                a.tofile(f)
+
+    @staticmethod
+    def load(path) -> tuple[KeystrokeLog, List[str]]:
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if header["version"] != KeystrokeLog.VERSION:
+                raise ValueError(f"Unsupported keystroke log version {header['version']} in {path}")
+            log = KeystrokeLog(t_start_ns=header["t_start_ns"])
+            for c, n in zip(KeystrokeLog.COLUMNS, header["lengths"]):
+                a = getattr(log, c)
+                a.fromfile(f, n)
+                if header["byteorder"] != sys.byteorder:
+                    a.byteswap()
+        return log, header["sections"]
+
+
+# }}}
+
+
 class ConfigConformScreenWrp:
     def __init__(self, parent: curses._CursesWindow, config: SessionSettings) -> None:
         self.parent = parent
@@ -437,33 +1088,14 @@ class ConfigConformScreenWrp:
 # def config_conform_sessionscreen(parent: curses._CursesWindow):
 
 
-def fix_height(
-    char_buffer: List[List[str]],
-    focus_line: int,
-    height: int,
-    replace_top: List[str] = None,
-    replace_bottom: List[str] = None,
-) -> List[List[str]]:
-    """Center on line number <line> and trim the rest. If passed replace top/bottom line with symbols like '^^^'/'vvv'"""
-    # logger.debug(f"Fixing height: len buffer:{len(char_buffer)}, focus:{focus_line}, height:{height}")
-    if height >= len(char_buffer):
-        return char_buffer
-    if focus_line <= (height - 1) // 2:
-        ret = char_buffer[:height]
-        if replace_bottom != None:
-            ret[height - 1] = replace_bottom
-        return ret
-    elif focus_line > len(char_buffer) - 1 - (height - (height % 2)) // 2:
-        ret = char_buffer[-height:]
-        if replace_top != None:
-            ret[0] = replace_top
-        return ret
-    ret = char_buffer[focus_line - (height - 1) // 2 : focus_line + (height - (height % 2)) // 2 + 1]
-    if replace_top != None:
-        ret[0] = replace_top
-    if replace_bottom != None:
-        ret[height - 1] = replace_bottom
-    return ret
+@PROFILER.timed("viewport")
+def viewport_top(n_lines: int, focus_line: int, height: int) -> int:
+    """first visible line when centering on line number <focus_line>"""
+    if height >= n_lines or focus_line <= (height - 1) // 2:
+        return 0
+    elif focus_line > n_lines - 1 - (height - (height % 2)) // 2:
+        return n_lines - height
+    return focus_line - (height - 1) // 2
 
 
 @dataclass()
@@ -472,81 +1104,846 @@ class SessionOptions:
 
     @staticmethod
     def load_from_dict(d) -> SessionOptions:
+        if not isinstance(d, dict) or not isinstance(d.get("RandomShuffle"), bool):
+            raise ValueError("options must be a mapping with a true/false RandomShuffle")
         return SessionOptions(RandomShuffle=d["RandomShuffle"])
 
 
+class SectionSource(ABC):  # {{{
+    """sections that are read while the session goes, for files too big to hold as a list"""
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        ...
+
+
+# chars without a decomposition that still have a typeable replacement
+TYPOGRAPHIC_CHARS = str.maketrans({"‘": "'", "’": "'", "‚": "'", "“": '"', "”": '"', "„": '"', "–": "-", "—": "-", "…": "...", "\u00a0": " "})
+
+
+class TypeableChars(dict):
+    """
+    str.translate table that keeps the valid inputs. Other whitespace becomes a space, other chars the
+    typeable part of their NFKD decomposition ('é' is 'e', '…' is '...') or nothing.
+    """
+
+    def __init__(self, valid: str) -> None:
+        super().__init__((ord(c), c) for c in valid)
+        self.update(TYPOGRAPHIC_CHARS)
+
+    def __missing__(self, c: int) -> Optional[str]:
+        if chr(c).isspace():
+            self[c] = " "
+        else:
+            self[c] = "".join(d for d in unicodedata.normalize("NFKD", chr(c)) if self.get(ord(d)) == d) or None
+        return self[c]
+
+
+class TextFileSource(SectionSource):
+    """
+    a plain text file like a book or a word list. Paragraphs are separated by blank lines, the lines of
+    a paragraph are joined with spaces. Sections are filled up to TEXT_SECTION_CHARS with whole words,
+    paragraphs within a section end with a newline. Words longer than TEXT_WORD_CHARS (urls, tables
+    without spaces) are split with spaces, TextLayout can't wrap them otherwise.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def __iter__(self) -> Iterator[str]:
+        table = TypeableChars(CONFIG.VALID_INPUTS.replace("\n", "").replace("\t", ""))
+        limit, word_limit = CONFIG.TEXT_SECTION_CHARS, CONFIG.TEXT_WORD_CHARS
+        parts, length, new_paragraph = [], 0, False
+        with open(self.path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                words = line.translate(table).split()
+                if not words:
+                    new_paragraph = length > 0
+                    continue
+                if any(len(word) > word_limit for word in words):
+                    words = [word[n : n + word_limit] for word in words for n in range(0, len(word), word_limit)]
+                for word in words:
+                    if length and length + 1 + len(word) > limit:
+                        yield "".join(parts)
+                        parts, length = [], 0
+                    if length:
+                        parts.append("\n" if new_paragraph else " ")
+                        length += 1
+                    parts.append(word)
+                    length += len(word)
+                    new_paragraph = False
+        if parts:
+            yield "".join(parts)
+
+
+class ShuffledSource(SectionSource):
+    """another source in random order, see shuffle_buffer"""
+
+    def __init__(self, source: SectionSource, buffer_size: int) -> None:
+        self.source = source
+        self.buffer_size = buffer_size
+
+    def __iter__(self) -> Iterator[str]:
+        return shuffle_buffer(self.source, self.buffer_size)
+
+
+def shuffle_buffer(items: Iterable[str], size: int) -> Iterator[str]:
+    """
+    items in random order while holding at most <size> of them: every new item takes the place of a
+    random one in the buffer, which is passed on. Items can only move <size> places towards the front.
+    """
+    buffer = []
+    for item in items:
+        if len(buffer) < size:
+            buffer.append(item)
+            continue
+        i = random.randrange(size)
+        yield buffer[i]
+        buffer[i] = item
+    random.shuffle(buffer)
+    yield from buffer
+
+
+class SectionStream:
+    """the sections of a session one at a time, with one section lookahead for has_next_section"""
+
+    def __init__(self, sections: Iterable[str]) -> None:
+        self.sections = iter(sections)
+        self.lookahead = next(self.sections, None)
+
+    def peek(self) -> Optional[str]:
+        return self.lookahead
+
+    def pop(self) -> Optional[str]:
+        """the next section, None after the last one"""
+        section = self.lookahead
+        if section is not None:
+            self.lookahead = next(self.sections, None)
+        return section
+
+
+# }}}
+
+
 @dataclass()
 class SessionFileRepr:
     """Representation of a session, is read from file"""
 
     title: str
     options: SessionOptions
-    sections: List[str]
+    sections: Union[List[str], SectionSource]
 
     @staticmethod
-    def load_from_file(path) -> SessionFileRepr:
-        r = yaml.safe_load(Path(path).read_text())
-        # TODO: any input validation
-        srepr = SessionFileRepr(title=r["title"], options=SessionOptions.load_from_dict(r["options"]), sections=r["sections"])
-        if srepr.options.RandomShuffle:
-            random.shuffle(srepr.sections)
+    def parse(data: bytes) -> SessionFileRepr:
+        """
+        sections in file order, shuffling is left to load_from_file. Instead of sections a file can name
+        a plain text file as source, relative to itself (see read)
+        """
+        r = yaml.load(data, Loader=YAML_LOADER)
+        if not isinstance(r, dict) or not {"title", "options"} <= r.keys() or ("sections" in r) == ("source" in r):
+            raise ValueError("expected a mapping with title, options and either sections or source")
+        if not isinstance(r["title"], str):
+            raise ValueError("title must be a string")
+        if "source" in r:
+            if not isinstance(r["source"], str) or not r["source"]:
+                raise ValueError("source must be the path of a text file")
+            sections = TextFileSource(r["source"])
+        else:
+            SessionFileRepr.validate_sections(r["sections"])
+            sections = r["sections"]
+        return SessionFileRepr(title=r["title"], options=SessionOptions.load_from_dict(r["options"]), sections=sections)
+
+    @staticmethod
+    def validate_sections(sections):
+        """every section has to be a non empty string that can be typed completely"""
+        if not isinstance(sections, list) or not sections:
+            raise ValueError("sections must be a non empty list")
+        valid = set(CONFIG.VALID_INPUTS)
+        for n, section in enumerate(sections):
+            if not isinstance(section, str) or not section:
+                raise ValueError(f"section {n} must be a non empty string")
+            unknown = set(section) - valid
+            if unknown:
+                raise ValueError(f"section {n} has chars that can't be typed: {''.join(sorted(unknown))!r}")
+
+    @staticmethod
+    def load_cached(data: bytes, cache_dir: Path = SESSION_CACHE_DIR) -> SessionFileRepr:
+        """parse data, or reuse what was parsed from the same bytes before; the cache is marshal'd and keyed by content hash"""
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        cache_path = cache_dir / f"{digest}.bin"
+        try:
+            version, title, shuffle, sections = marshal.loads(cache_path.read_bytes())
+            if version == (SESSION_CACHE_VERSION, marshal.version):
+                if isinstance(sections, str):
+                    sections = TextFileSource(sections)
+                try:
+                    # the mtime tells prune_session_cache what was used recently
+                    os.utime(cache_path)
+                except OSError:
+                    pass
+                return SessionFileRepr(title=title, options=SessionOptions(RandomShuffle=shuffle), sections=sections)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, EOFError, TypeError) as e:
+            logger.warning("Ignoring broken session cache %s: %s", cache_path, e)
+
+        srepr = SessionFileRepr.parse(data)
+        # for a source only its path is stored
+        sections = srepr.sections.path if isinstance(srepr.sections, TextFileSource) else srepr.sections
+        try:
+            blob = marshal.dumps(((SESSION_CACHE_VERSION, marshal.version), srepr.title, srepr.options.RandomShuffle, sections))
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = cache_dir / f"{digest}.{os.getpid()}.tmp"
+            tmp.write_bytes(blob)
+            os.replace(tmp, cache_path)
+        except (ValueError, OSError) as e:
+            # ValueError: yaml gave us something marshal can't store
+            logger.warning("Can't cache session %s: %s", cache_path, e)
+        return srepr
+
+    @staticmethod
+    def read(path) -> SessionFileRepr:
+        """sections in file order, a .txt file is a session of its own that isn't shuffled"""
+        path = Path(path)
+        if path.suffix == ".txt":
+            return SessionFileRepr(title=path.stem, options=SessionOptions(RandomShuffle=False), sections=TextFileSource(str(path)))
+        srepr = SessionFileRepr.load_cached(path.read_bytes())
+        if isinstance(srepr.sections, TextFileSource):
+            srepr.sections = TextFileSource(str(path.parent / srepr.sections.path))
         return srepr
 
+    def shuffled(self) -> SessionFileRepr:
+        """copy to start a session with, sections are shuffled if the file asks for it; sources are shuffled while streaming"""
+        if not isinstance(self.sections, list):
+            if self.options.RandomShuffle:
+                return replace(self, sections=ShuffledSource(self.sections, CONFIG.SHUFFLE_BUFFER))
+            return self
+        sections = list(self.sections)
+        if self.options.RandomShuffle:
+            random.shuffle(sections)
+        return replace(self, sections=sections)
+
+    def first_section(self) -> str:
+        """without reading more of a source than that"""
+        return next(iter(self.sections), "")
+
+    @staticmethod
+    def load_from_file(path) -> SessionFileRepr:
+        return SessionFileRepr.read(path).shuffled()
+
+
+def prune_session_cache(cache_dir: Path = SESSION_CACHE_DIR, max_bytes: int = SESSION_CACHE_MAX_BYTES) -> int:
+    """
+    delete the least recently used blobs until the cache fits into max_bytes, returns how many were
+    deleted. Every edit of a session file leaves a blob for the old content behind.
+    """
+    blobs = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".bin"):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    blobs.append((st.st_mtime_ns, st.st_size, entry.path))
+    except OSError:
+        return 0
+    total = sum(size for _, size, _ in blobs)
+    deleted = 0
+    for _, size, path in sorted(blobs):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    if deleted:
+        logger.info("Session cache: deleted %d blobs, %d bytes left", deleted, total)
+    return deleted
+
+
+@dataclass()
+class CorpusEntry:
+    """what the picker needs to know about a session file, without parsing it again"""
+
+    path: str
+    mtime_ns: int
+    size: int
+    title: str
+    sections: int
+    chars: int
+    charset: str  # every char used in the sections, sorted
+    error: Optional[str] = None  # why the file couldn't be loaded, the other fields are empty then
+    # the text file a .yml takes its sections from, it has to be checked for changes as well
+    source: Optional[str] = None
+    source_mtime_ns: int = -1  # -1 if it couldn't be read
+    source_size: int = -1
+    # every trigram of the normalized section text (see search_text), sorted and concatenated. Only set
+    # between parsing and parse_session_files moving it into TrigramIndex lists, it isn't saved
+    trigrams: str = ""
+
+    @staticmethod
+    def from_file(path: str, st: os.stat_result) -> CorpusEntry:
+        # one section at a time, sources can be bigger than memory
+        n_sections, n_chars, charset, grams, tail = 0, 0, set(), set(), ""
+        source_fields = {}
+        try:
+            srepr = SessionFileRepr.read(path)
+            if isinstance(srepr.sections, TextFileSource) and srepr.sections.path != path:
+                source_fields["source"] = srepr.sections.path
+                source_fields["source_mtime_ns"], source_fields["source_size"] = CorpusEntry.stat_source(srepr.sections.path)
+            for section in srepr.sections:
+                n_sections += 1
+                n_chars += len(section)
+                charset.update(section)
+                # same trigrams as for the whole text joined with spaces
+                text = search_text(section)
+                if text:
+                    text = f"{tail} {text}" if tail else text
+                    grams.update(trigrams(text))
+                    tail = text[-2:]
+            if not n_sections:
+                raise ValueError("no sections")
+        except Exception as e:
+            return CorpusEntry(path, st.st_mtime_ns, st.st_size, "", 0, 0, "", error=f"{type(e).__name__}: {e}", **source_fields)
+        return CorpusEntry(
+            path,
+            st.st_mtime_ns,
+            st.st_size,
+            str(srepr.title),
+            n_sections,
+            n_chars,
+            "".join(sorted(charset)),
+            trigrams="".join(sorted(grams)),
+            **source_fields,
+        )
+
+    @staticmethod
+    def stat_source(path: str) -> tuple[int, int]:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return -1, -1
+        return st.st_mtime_ns, st.st_size
+
+    def is_stale(self, st: os.stat_result) -> bool:
+        """the file or its source changed since it was parsed"""
+        if self.mtime_ns != st.st_mtime_ns or self.size != st.st_size:
+            return True
+        return self.source is not None and self.stat_source(self.source) != (self.source_mtime_ns, self.source_size)
+
+    def label(self, basepath: str) -> str:
+        """one line for the picker"""
+        return f"{self.title[:40]:<40} {self.sections:>5} sections {self.chars:>9} chars   {os.path.relpath(self.path, basepath)}"
+
+
+def parse_session_files(files: List[Tuple[str, os.stat_result]], first_id: int) -> Tuple[List[CorpusEntry], dict]:
+    """
+    CorpusEntry.from_file for a batch of files, runs in the ingest workers. The trigrams come back as
+    TrigramIndex lists for the ids first_id, first_id + 1, ..., so the parent only has to extend one
+    list per trigram and batch instead of adding every id on its own.
+    """
+    entries, lists = [], {}
+    for i, (path, st) in enumerate(files, first_id):
+        entry = CorpusEntry.from_file(path, st)
+        grams = entry.trigrams
+        for n in range(0, len(grams), 3):
+            ids = lists.get(grams[n : n + 3])
+            if ids is None:
+                ids = lists[grams[n : n + 3]] = array("I")
+            ids.append(i)
+        entry.trigrams = ""
+        entries.append(entry)
+    return entries, {t: ids.tobytes() for t, ids in lists.items()}
+
+
+class TrigramIndex:  # {{{
+    """
+    trigram -> ids of the files whose section text contains it, for searching the picker by text. Kept
+    next to the corpus index as a zlib compressed marshal blob with one array of ids per trigram, so
+    loading it is cheap and only the lists a query needs are decoded. A changed or removed file only
+    loses its id (paths[id] is None) until more than half of the ids are dead.
+    """
+
+    VERSION = 1
+
+    def __init__(self, paths: List[Optional[str]], lists: dict) -> None:
+        self.paths = paths  # id -> path
+        self.lists = lists  # trigram -> ids, as bytes of an array("I") or the array while it is built
+        self.ids = {path: i for i, path in enumerate(paths) if path is not None}
+
+    @staticmethod
+    def load(path: Path) -> Optional[TrigramIndex]:
+        """None if there is no usable index at path"""
+        try:
+            version, paths, lists = marshal.loads(zlib.decompress(path.read_bytes()))
+            if version == (TrigramIndex.VERSION, marshal.version, sys.byteorder):
+                return TrigramIndex(paths, lists)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, EOFError, TypeError, zlib.error) as e:
+            logger.warning("Ignoring broken trigram index %s: %s", path, e)
+        return None
+
+    def save(self, path: Path):
+        lists = {t: ids.tobytes() if isinstance(ids, array) else ids for t, ids in self.lists.items()}
+        blob = zlib.compress(marshal.dumps(((self.VERSION, marshal.version, sys.byteorder), self.paths, lists)), 1)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+
+    def remove(self, path: str):
+        i = self.ids.pop(path, None)
+        if i is not None:
+            self.paths[i] = None
+
+    def extend(self, paths: List[Optional[str]], lists: dict):
+        """
+        add a batch from parse_session_files, whose first_id was len(self.paths). paths are in id order,
+        None for files that couldn't be parsed; what was indexed for them before is replaced
+        """
+        for path in paths:
+            if path is not None:
+                self.remove(path)
+                self.ids[path] = len(self.paths)
+            self.paths.append(path)
+        for t, new in lists.items():
+            ids = self.lists.get(t)
+            if not isinstance(ids, array):
+                ids = self.lists[t] = array("I", ids or b"")
+            ids.frombytes(new)
+
+    def compact(self):
+        """renumber the files once most ids are dead"""
+        if 2 * len(self.ids) >= len(self.paths):
+            return
+        renumber = {i: n for n, i in enumerate(sorted(self.ids.values()))}
+        lists = {}
+        for t, ids in self.lists.items():
+            alive = array("I", [renumber[i] for i in array("I", ids) if i in renumber])
+            if alive:
+                lists[t] = alive
+        self.paths = [path for path in self.paths if path is not None]
+        self.ids = {path: i for i, path in enumerate(self.paths)}
+        self.lists = lists
+
+    def get(self, trigram: str) -> array:
+        """ids of the files that contain trigram, dead ones included"""
+        return array("I", self.lists.get(trigram, b""))
+
+
+# }}}
+
+
+class CorpusIndex:  # {{{
+    """
+    index of the session files in one directory, kept as json in CACHE_DIR between runs. Files are only
+    parsed again when their mtime or size, or that of their source, changed. The trigrams for searching by text go into a
+    TrigramIndex next to it.
+    """
+
+    VERSION = 4
+
+    def __init__(self, basepath: str, index_path: Path, entries: dict) -> None:
+        self.basepath = basepath
+        self.index_path = index_path
+        self.postings_path = index_path.with_suffix(".trigrams")
+        self.entries = entries  # path -> CorpusEntry
+        self.last_parsed = []  # entries the last update had to parse
+
+    @staticmethod
+    def load(basepath: str, cache_dir: Path = CACHE_DIR) -> CorpusIndex:
+        basepath = os.path.abspath(basepath)
+        name = hashlib.blake2b(basepath.encode(), digest_size=8).hexdigest()
+        index_path = cache_dir / f"index-{name}.json"
+        entries = {}
+        try:
+            data = json.loads(index_path.read_text())
+            if data["version"] == CorpusIndex.VERSION and data["basepath"] == basepath:
+                entries = {d["path"]: CorpusEntry(**d) for d in data["entries"]}
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("Ignoring broken corpus index %s: %s", index_path, e)
+        return CorpusIndex(basepath, index_path, entries)
+
+    def save(self):
+        entries = [asdict(e) for e in self.entries.values()]
+        for e in entries:
+            del e["trigrams"]
+        data = {"version": self.VERSION, "basepath": self.basepath, "entries": entries}
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False))
+        os.replace(tmp, self.index_path)
+
+    def update(self, executor: Optional[Executor] = None, chunksize: int = 1, force: bool = False) -> List[CorpusEntry]:
+        """
+        rescan the directory and save the index if anything changed, returns the entries in picker order.
+        Changed files are parsed by the executor if there is one, in batches of chunksize files; force
+        parses all of them again. The TrigramIndex is only loaded when something has to change in it.
+        """
+        scanned = scan_session_files(self.basepath)
+        if not self.postings_path.exists():
+            # the trigrams of every file are needed again
+            force = True
+        removed = self.entries.keys() - {path for path, _ in scanned}
+        stale = []
+        for path, st in scanned:
+            entry = self.entries.get(path)
+            if force or entry is None or entry.is_stale(st):
+                stale.append((path, st))
+        postings = None
+        if stale or removed:
+            postings = None if force else TrigramIndex.load(self.postings_path)
+            if postings is None:
+                postings = TrigramIndex([], {})
+                stale = scanned
+            for path in removed:
+                postings.remove(path)
+        fresh = []
+        if stale:
+            if executor is None:
+                batches, parse = [stale], map
+            else:
+                batches, parse = [stale[n : n + chunksize] for n in range(0, len(stale), chunksize)], executor.map
+            # results come back in order, so every batch knows the ids it gets before it is parsed
+            first_ids = itertools.accumulate((len(b) for b in batches[:-1]), initial=len(postings.paths))
+            for entries, lists in parse(parse_session_files, batches, first_ids):
+                postings.extend([e.path if e.error is None else None for e in entries], lists)
+                fresh += entries
+        for entry in fresh:
+            if entry.error is not None:
+                logger.warning("Can't load session file %s: %s", entry.path, entry.error)
+        parsed = len(fresh)
+        self.last_parsed = fresh
+        fresh = {e.path: e for e in fresh}
+        entries = {path: fresh.get(path) or self.entries[path] for path, _ in scanned}
+        changed = parsed > 0 or entries.keys() != self.entries.keys()
+        self.entries = entries
+        if changed:
+            postings.compact()
+            try:
+                self.save()
+                postings.save(self.postings_path)
+            except OSError as e:
+                logger.warning("Can't write corpus index %s: %s", self.index_path, e)
+        if parsed:
+            prune_session_cache()
+        logger.info("Corpus index: %d files, %d parsed", len(entries), parsed)
+        return list(entries.values())
+
+    def sessions(self) -> List[CorpusEntry]:
+        """up to date entries that can be opened, what the picker shows"""
+        return [e for e in self.update() if e.error is None]
+
+
+# }}}
+
+
+def search_text(s: str) -> str:
+    """what searching compares: lower case, any run of whitespace is one space"""
+    return " ".join(s.lower().split())
+
+
+def trigrams(s: str) -> set:
+    return {s[i : i + 3] for i in range(len(s) - 2)}
+
+
+def is_subsequence(query: str, s: str) -> bool:
+    """the chars of query appear in s in the same order, not necessarily next to each other"""
+    it = iter(s)
+    return all(c in it for c in query)
+
+
+class SearchIndex:  # {{{
+    """
+    type-to-filter search over the picker rows. A row matches if the query is a subsequence of its key
+    (path and title) or, for queries of 3 or more chars, a substring of its section text as far as the
+    trigrams can tell. Every typed char narrows the previous results with the trigrams it adds, backspace
+    goes back to them.
+    """
+
+    def __init__(self, keys: List[str], paths: Optional[List[str]] = None, postings: Optional[Future] = None) -> None:
+        """without paths and postings (a Future of the TrigramIndex) only the keys are searched"""
+        self.keys = [search_text(k) for k in keys]
+        self.rows = {path: row for row, path in enumerate(paths or [])}
+        self.postings = postings
+        self.id_rows = None  # TrigramIndex id -> row, once the postings are there
+        # for every prefix of the current query: (query, rows whose key matches, rows whose text may match, results).
+        # Text only narrows from 3 chars on, shorter queries keep every row as a text candidate
+        rows = list(range(len(keys)))
+        self.stack = [("", rows, rows, rows)]
+
+    @staticmethod
+    def from_corpus(entries: List[CorpusEntry], index: CorpusIndex) -> SearchIndex:
+        """the trigram index is loaded in the background, it is usually there before the first query needs it"""
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="typo-trigrams")
+        postings = executor.submit(TrigramIndex.load, index.postings_path)
+        executor.shutdown(wait=False)
+        keys = [f"{os.path.relpath(e.path, index.basepath)} {e.title}" for e in entries]
+        return SearchIndex(keys, [e.path for e in entries], postings)
+
+    @property
+    def query(self) -> str:
+        return self.stack[-1][0]
+
+    @property
+    def results(self) -> List[int]:
+        return self.stack[-1][3]
+
+    @property
+    def text_pending(self) -> bool:
+        """the query is too short to search the section text yet"""
+        return self.postings is not None and 0 < len(search_text(self.query)) < 3
+
+    def trigram_rows(self, trigram: str) -> set:
+        """rows whose section text contains trigram"""
+        if self.postings is None:
+            return set()
+        postings = self.postings.result()
+        if postings is None:
+            return set()
+        if self.id_rows is None:
+            self.id_rows = {i: self.rows[path] for path, i in postings.ids.items() if path in self.rows}
+        id_rows = self.id_rows
+        return {id_rows[i] for i in postings.get(trigram) if i in id_rows}
+
+    def push(self, c: str) -> List[int]:
+        """add c to the query; anything that matches the new query matched the old one, so only its rows are checked"""
+        query = self.query + c
+        _, key_rows, text_rows, _ = self.stack[-1]
+        normalized = search_text(query)
+        key_rows = [row for row in key_rows if is_subsequence(normalized, self.keys[row])]
+        if len(normalized) < 3:
+            results = key_rows
+        else:
+            # the normalized old query is a prefix of the new one and text_rows has all of its trigrams
+            for t in trigrams(normalized) - trigrams(search_text(self.query)):
+                if not text_rows:
+                    break
+                found = self.trigram_rows(t)
+                text_rows = [row for row in text_rows if row in found]
+            in_keys = set(key_rows)
+            results = key_rows + [row for row in text_rows if row not in in_keys]
+        self.stack.append((query, key_rows, text_rows, results))
+        return self.results
+
+    def pop(self) -> List[int]:
+        if len(self.stack) > 1:
+            self.stack.pop()
+        return self.results
+
+    def clear(self) -> List[int]:
+        del self.stack[1:]
+        return self.results
+
+
+# }}}
+
+
+class CachedSession(NamedTuple):
+    srepr: SessionFileRepr  # sections in file order
+    preview: str  # start of the first section, read together with the file so sources aren't opened again
+
+
+class SessionCache:  # {{{
+    """
+    lru cache of parsed session files by path. Files are read on a worker thread so the picker never
+    waits for a parse or a source; only the most recently requested file is kept in the queue.
+    """
+
+    PREVIEW_CHARS = 4096  # more than a preview pane shows
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.sessions: OrderedDict[str, CachedSession] = OrderedDict()
+        self.pending: dict[str, Future] = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="typo-sessions")
+
+    @staticmethod
+    def read(path: str) -> CachedSession:
+        srepr = SessionFileRepr.read(path)
+        return CachedSession(srepr, srepr.first_section()[: SessionCache.PREVIEW_CHARS])
+
+    def put(self, path: str, cached: CachedSession):
+        self.sessions[path] = cached
+        if len(self.sessions) > self.maxsize:
+            self.sessions.popitem(last=False)
+
+    def get(self, path: str) -> Optional[CachedSession]:
+        """the parsed file if it is cached, otherwise None and it is loaded in the background; raises what reading raised"""
+        cached = self.sessions.get(path)
+        if cached is not None:
+            self.sessions.move_to_end(path)
+            return cached
+        future = self.pending.get(path)
+        if future is None:
+            # whatever was requested before and didn't start yet isn't needed any more
+            for p, f in list(self.pending.items()):
+                if f.cancel():
+                    del self.pending[p]
+            self.pending[path] = self.executor.submit(self.read, path)
+            return None
+        if not future.done():
+            return None
+        del self.pending[path]
+        cached = future.result()
+        self.put(path, cached)
+        return cached
+
+    def load(self, path: str) -> SessionFileRepr:
+        """the parsed file like get, but waits for it"""
+        cached = self.get(path)
+        if cached is None:
+            cached = self.pending.pop(path).result()
+            self.put(path, cached)
+        return cached.srepr
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# }}}
+
+
+def charset_summary(charset: str) -> str:
+    """'a-z A-Z 0-9' for complete ranges, everything else is listed"""
+    chars = set(charset)
+    parts, rest = [], chars
+    for first, last in (("a", "z"), ("A", "Z"), ("0", "9")):
+        r = {chr(c) for c in range(ord(first), ord(last) + 1)}
+        if r <= chars:
+            parts.append(f"{first}-{last}")
+            rest = rest - r
+    replacements = CONFIG.replacements
+    parts.append("".join(replacements.get(c, c)[0] for c in sorted(rest)))
+    return " ".join(p for p in parts if p)
+
+
+class SessionPreview:  # {{{
+    """what the picker shows below the list for the highlighted session file"""
+
+    height = 10
+
+    def __init__(self, entries: List[CorpusEntry], cache: SessionCache) -> None:
+        self.entries = entries
+        self.cache = cache
+
+    def lines(self, row: int, width: int) -> tuple[List[str], bool]:
+        """lines for content row <row>, and whether the file is still loading"""
+        entry = self.entries[row]
+        lines = [
+            f"{entry.title}: {entry.sections} sections, {entry.chars} chars",
+            f"{len(entry.charset)} different chars: {charset_summary(entry.charset)}",
+        ]
+        try:
+            cached = self.cache.get(entry.path)
+        except Exception as e:
+            return lines + [f"Can't load {entry.path}: {e}"], False
+        if cached is None:
+            return lines + ["..."], True
+        # first section as it would be typed, tabs and newlines included
+        for paragraph in cached.preview.expandtabs(4).split("\n"):
+            lines.extend(wrap(paragraph, width) or [""])
+            if len(lines) >= self.height:
+                break
+        return lines, False
+
+
+# }}}
+
 
 class Session:
-    def __init__(self, mainscreen: curses._CursesWindow, sessionrepr: SessionFileRepr) -> None:
+    def __init__(self, mainscreen: Optional[curses._CursesWindow], sessionrepr: SessionFileRepr) -> None:
+        """without a mainscreen the session is headless: nothing is drawn, see replay_session"""
         self.screen = mainscreen
         self.sessionrepr = sessionrepr
+        self.sections = SectionStream(sessionrepr.sections)
         self.section_nr = 0
-        self.text = SessionTextObject(sessionrepr.sections[self.section_nr])
+        section = self.sections.pop()
+        if section is None:
+            raise ValueError(f"{sessionrepr.title} has no sections")
+        self.typed_sections = [section]  # every section shown so far, for the keystroke log
+        self.text = SessionTextObject(section)
         self.len_typed_carryover = 0
         self.acc_typed_carryover = []
-        self.t_start = time.time()
+        # sum of accuracy * typed chars over acc_typed_carryover
+        self.acc_weighted_carryover = 0.0
+        self.corrected_errors_carryover = []
+        self.keylog = KeystrokeLog()
+        self.keylog.start_section()
+        self.t_start_ns = self.keylog.t_start_ns
 
         self.border = None
 
         self.wpm_call = lambda: f"{self.calc_wpm():.1f}"
         self.acc_call = lambda: f"{self.calc_acc():.1f}"
-        # self.sessionscreen = self.screen.derwin(0, 0)  # init sessionwindow
-        self.sessionscreen = ConfigConformScreenWrp(mainscreen, CONFIG)
-        self.sessionscreen.screen.keypad(True)  # Fix arrow keys
+        self.backend = backend_for(mainscreen) if mainscreen is not None else None
+        self.sessionscreen = None
         self.wpmscreen = None
         self.accscreen = None
-        self.draw_session()
-
-    def calc_wpm(self) -> float:
+        self.renderer = None
+        self.stats_drawn = {}
+        self.hudscreen = None
+        self.hud_visible = CONFIG.HUD_WINDOW.active
+        if mainscreen is not None:
+            # self.sessionscreen = self.screen.derwin(0, 0)  # init sessionwindow
+            self.sessionscreen = ConfigConformScreenWrp(mainscreen, CONFIG)
+            self.sessionscreen.screen.keypad(True)  # Fix arrow keys
+            self.draw_session()
+
+    def calc_wpm(self, now_ns: Optional[int] = None) -> float:
         sum_typed = self.len_typed_carryover + len(self.text.typed)
-        return (sum_typed / CHARACTERS_PER_WORD) / ((time.time() - self.t_start) / 60)
+        now_ns = time.monotonic_ns() if now_ns is None else now_ns
+        return (sum_typed / CHARACTERS_PER_WORD) / (max(now_ns - self.t_start_ns, 1) / 60e9)
 
     def calc_acc(self) -> float:
         # TODO: is this really the correct calculation?
-        curr_len = len(self.text.completed_chars())
+        curr_len = self.text.completed_count()
         curr_len = max([curr_len, 1])
-        sum_len = curr_len
-        avg_acc = self.text.get_accuracy() * curr_len
-        for a, l in self.acc_typed_carryover:
-            sum_len += l
-            avg_acc += a * l
+        sum_len = curr_len + self.len_typed_carryover
+        avg_acc = self.text.get_accuracy() * curr_len + self.acc_weighted_carryover
         return avg_acc / sum_len
 
     def is_complete(self):
         return self.text.is_complete()
 
-    def type_backspace(self):
-        self.text.type_backspace()
+    def type_backspace(self, t_ns: Optional[int] = None):
+        i = len(self.text.typed) - 1
+        expected = self.text.expected_char(i) if i >= 0 else ""
+        state = self.text.type_backspace()
+        outcome = KeyOutcome.CORRECTION if state == CharState.WRONG else KeyOutcome.BACKSPACE
+        self.keylog.record(time.monotonic_ns() if t_ns is None else t_ns, "", expected, outcome)
 
-    def type_char(self, c):
-        self.text.type_char(c)
+    def type_char(self, c, t_ns: Optional[int] = None):
+        expected = self.text.expected_char(len(self.text.typed))
+        state = self.text.type_char(c)
+        outcome = KeyOutcome.CORRECT if state == CharState.CORRECT else KeyOutcome.WRONG
+        self.keylog.record(time.monotonic_ns() if t_ns is None else t_ns, c, expected, outcome)
+
+    def has_next_section(self) -> bool:
+        return self.sections.peek() is not None
 
     def next_section(self):
         # TODO: save accuracy and wpm from self.text for later
         self.section_nr += 1
-        if len(self.sessionrepr.sections) <= self.section_nr:
-            raise ValueError(f"DONE\nrepr{ len(self.sessionrepr.sections) } \t nr {self.section_nr}\n{self.sessionrepr.sections}")
-        len_typed = len(self.text.completed_chars())
+        section = self.sections.pop()
+        if section is None:
+            raise ValueError(f"DONE\nno section after nr {self.section_nr - 1} of {self.sessionrepr.title}")
+        len_typed = self.text.completed_count()
+        acc = self.text.get_accuracy()
         self.len_typed_carryover += len_typed
-        self.acc_typed_carryover.append((self.text.get_accuracy(), len_typed))
-        self.text = SessionTextObject(self.sessionrepr.sections[self.section_nr])
+        self.acc_typed_carryover.append((acc, len_typed))
+        self.acc_weighted_carryover += acc * len_typed
+        self.corrected_errors_carryover.extend(self.text.corrected_errors)
+        self.typed_sections.append(section)
+        self.text = SessionTextObject(section)
+        self.keylog.start_section()
 
     def draw_session(self):
         """completely redraw session, like after a resize"""
@@ -556,115 +1953,268 @@ class Session:
         When no chars are added the border is refreshed incorrectly and no error is raised.
         This behavior is reproducable with a minimal setup.
         """
-        curses.curs_set(0)
+        self.backend.curs_set(0)
         self.screen.erase()
         self.sessionscreen = ConfigConformScreenWrp(parent=self.screen, config=CONFIG)
+        self.sessionscreen.screen.keypad(True)  # keys are read from this window, F2 and arrows need keypad mode
+        self.renderer = TextRenderer(self.sessionscreen, self.backend)
+        self.stats_drawn = {}
 
         # TODO: move this routine to the same function as the sessionscreen resize/move routine
-        assert isinstance(CONFIG.WPM_WINDOW.window_spacing.bottom, int)
-        assert isinstance(CONFIG.WPM_WINDOW.window_spacing.right, int)
-        assert isinstance(CONFIG.ACC_WINDOW.window_spacing.bottom, int)
-        assert isinstance(CONFIG.ACC_WINDOW.window_spacing.right, int)
+        for dimensions in (CONFIG.WPM_WINDOW, CONFIG.ACC_WINDOW, CONFIG.HUD_WINDOW):
+            assert isinstance(dimensions.window_spacing.top, int) or isinstance(dimensions.window_spacing.bottom, int)
+            assert isinstance(dimensions.window_spacing.left, int) or isinstance(dimensions.window_spacing.right, int)
         assert isinstance(CONFIG.COLOR_SCHEME, ColorScheme)
-        wpm_y = (
-            CONFIG.WPM_WINDOW.window_spacing.top
-            if CONFIG.WPM_WINDOW.window_spacing.top is not None
-            else self.screen.getmaxyx()[0] - CONFIG.WPM_WINDOW.nlines - CONFIG.WPM_WINDOW.window_spacing.bottom
-        )
-        wpm_x = (
-            CONFIG.WPM_WINDOW.window_spacing.left
-            if CONFIG.WPM_WINDOW.window_spacing.left is not None
-            else self.screen.getmaxyx()[1] - CONFIG.WPM_WINDOW.ncols - CONFIG.WPM_WINDOW.window_spacing.right
-        )
-        acc_y = (
-            CONFIG.ACC_WINDOW.window_spacing.top
-            if CONFIG.ACC_WINDOW.window_spacing.top is not None
-            else self.screen.getmaxyx()[0] - CONFIG.ACC_WINDOW.nlines - CONFIG.ACC_WINDOW.window_spacing.bottom
-        )
-        acc_x = (
-            CONFIG.ACC_WINDOW.window_spacing.left
-            if CONFIG.ACC_WINDOW.window_spacing.left is not None
-            else self.screen.getmaxyx()[1] - CONFIG.ACC_WINDOW.ncols - CONFIG.ACC_WINDOW.window_spacing.right
-        )
+        wpm_y, wpm_x = self.window_origin(CONFIG.WPM_WINDOW)
+        acc_y, acc_x = self.window_origin(CONFIG.ACC_WINDOW)
         self.wpmscreen = self.screen.subwin(CONFIG.WPM_WINDOW.nlines, CONFIG.WPM_WINDOW.ncols, wpm_y, wpm_x)
         self.wpmscreen.attrset(CONFIG.COLOR_SCHEME.accent)
         self.wpmscreen.border()
         self.wpmscreen.noutrefresh()
         self.wpmscreen.attrset(CONFIG.COLOR_SCHEME.fg)
+        self.wpmscreen.leaveok(True)  # refreshing the stats must not move the cursor out of the text
         self.accscreen = self.screen.subwin(CONFIG.ACC_WINDOW.nlines, CONFIG.ACC_WINDOW.ncols, acc_y, acc_x)
         self.accscreen.attrset(CONFIG.COLOR_SCHEME.accent)
         self.accscreen.border()
         self.accscreen.noutrefresh()
         self.accscreen.attrset(CONFIG.COLOR_SCHEME.fg)
+        self.accscreen.leaveok(True)
+        self.hudscreen = None
+        if self.hud_visible:
+            self.make_hud()
         self.screen.refresh()
         self.draw_characters()
-        curses.curs_set(1)
+        self.backend.curs_set(1)
+
+    def window_origin(self, dimensions: WindowDimensions) -> tuple[int, int]:
+        """top left corner of a window placed by its spacing to the edges of the screen"""
+        spacing = dimensions.window_spacing
+        height, width = self.screen.getmaxyx()
+        y = spacing.top if spacing.top is not None else height - dimensions.nlines - spacing.bottom
+        x = spacing.left if spacing.left is not None else width - dimensions.ncols - spacing.right
+        return y, x
 
-    def draw_characters(self):
-        """draw guide text, typos and correctly typed chars in their respective colors"""
-        self.sessionscreen.redraw_border()
-        y, x = self.sessionscreen.getmaxyx()
+    def make_hud(self):
+        """create the overlay window, it stays hidden if it doesn't fit on the screen"""
+        y, x = self.window_origin(CONFIG.HUD_WINDOW)
+        try:
+            self.hudscreen = self.backend.newwin(CONFIG.HUD_WINDOW.nlines, CONFIG.HUD_WINDOW.ncols, y, x)
+        except curses.error:
+            logger.warning(f"Screen too small for the profiling overlay: {self.screen.getmaxyx()}")
+            self.hud_visible = False
+            return
+        self.hudscreen.leaveok(True)
 
-        # Getting the position of the mouse so we know which line to center on
-        typed = self.text.get_typed_chars(width=x - 2, correct=True, typos=True)
-        line = len([x for x in typed if x != []]) - 1
-        c = len([x for x in typed[line] if x != ""]) + CONFIG.BORDER_PADDING.left
+    def toggle_hud(self):
+        self.hud_visible = not self.hud_visible
+        if self.hud_visible:
+            self.make_hud()
+        else:
+            # the overlay covers parts of the text, repaint everything below it
+            self.draw_session()
 
-        # Keep track of last printed correct/incorrect char for cursor position
+    @PROFILER.timed("frame")
+    def draw_characters(self):
+        """draw guide text, typos and correctly typed chars in their respective colors; only changed cells are drawn"""
+        # Routine for wpm and accuracy, refreshed first so the cursor ends up in the sessionscreen
+        self.draw_stats()
+        self.renderer.render(self.text)
+        self.draw_hud()
+        t = time.perf_counter_ns()
+        self.backend.doupdate()
+        PROFILER.record("doupdate", time.perf_counter_ns() - t)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Frame: %s", self.renderer.last_frame)
+
+    def draw_hud(self):
+        """profiling overlay on top of everything else, the cursor is put back where the text is typed"""
+        if self.hudscreen is None or not self.hud_visible:
+            return
+        nlines, ncols = self.hudscreen.getmaxyx()
+        self.hudscreen.erase()
+        self.hudscreen.attrset(CONFIG.COLOR_SCHEME.accent)
+        self.hudscreen.border()
+        self.hudscreen.attrset(CONFIG.COLOR_SCHEME.fg)
+        for n, row in enumerate(PROFILER.table()[: nlines - 2]):
+            self.hudscreen.addstr(1 + n, 1, row[: ncols - 2])
+        # the text below may have been painted over the overlay since the last frame
+        self.hudscreen.touchwin()
+        self.hudscreen.noutrefresh()
+        self.backend.setsyx(*self.renderer.cursor)
+
+    def draw_stats(self):
+        """write wpm and accuracy, windows whose text didn't change are left alone"""
+        for window, call in ((self.wpmscreen, self.wpm_call), (self.accscreen, self.acc_call)):
+            s = call().ljust(window.getmaxyx()[1] - 2)
+            if self.stats_drawn.get(window) != s:
+                window.addstr(1, 1, s)
+                window.noutrefresh()
+                self.stats_drawn[window] = s
+
+
+class FrameStats(NamedTuple):
+    calls: int  # curses calls that put text into the window
+    cells: int
+    bytes: int  # encoded size of the text that was put
+
+
+class TextRenderer:  # {{{
+    """
+    draws a SessionTextObject into the sessionscreen, remembering what is on screen between frames.
+    The whole section is painted once into a pad, afterwards only changed chars are painted and the
+    visible part of the pad is copied into the sessionscreen area.
+    """
+
+    def __init__(self, sessionscreen: ConfigConformScreenWrp, backend: ScreenBackend) -> None:
+        self.sessionscreen = sessionscreen
+        self.backend = backend
+        self.attrs = {
+            CharState.UNTYPED: 0,
+            CharState.CORRECT: CONFIG.COLOR_SCHEME.correct | curses.A_ITALIC,
+            CharState.WRONG: CONFIG.COLOR_SCHEME.wrong | curses.A_UNDERLINE,
+        }
         # +1 are needed to compensate for the border arround the window
-        curs_y_base, curs_x_base = (1 + CONFIG.BORDER_PADDING.top, 1 + CONFIG.BORDER_PADDING.left)
-        curs_y, curs_x = (1 + CONFIG.BORDER_PADDING.top, 1 + CONFIG.BORDER_PADDING.left)
-
-        # Print base 'guide' chars
-        # FIX: this is ugly as fuck! how do i reformat this?
-        guide_chars = fix_height(
-            self.text.get_guide_chars(width=x - 2),
-            focus_line=line,
-            height=y - 2,
-            replace_top=[""],
-            replace_bottom=["v", "v", "v"],
-        )
-        for i, l in enumerate(guide_chars):
-            self.sessionscreen.screen.addstr(i + curs_y_base, curs_x_base, "".join(l))
-
-        # print correct chars
-        correct_chars = fix_height(
-            self.text.get_typed_chars(width=x - 2, correct=True),
-            focus_line=line,
-            height=y - 2,
-            replace_top=["^", "^", "^"],
-        )
-        for iy, l in enumerate(correct_chars, start=CONFIG.BORDER_PADDING.top):
-            for ix, c in enumerate(l, start=CONFIG.BORDER_PADDING.left):
-                if c:
-                    if iy + curs_y_base > curs_y:
-                        # INFO: +1 is propably border width?
-                        curs_y = iy + 1
-                        curs_x = 1
-                    curs_x = ix + 2 if ix + 2 > curs_x and iy + 1 >= curs_y else curs_x
-                    self.sessionscreen.screen.addch(iy + 1, ix + 1, c, CONFIG.COLOR_SCHEME.correct | curses.A_ITALIC)
-
-        # print typos
-        typo_chars = fix_height(self.text.get_typed_chars(width=x - 2, correct=False), focus_line=line, height=y - 2)
-        for iy, l in enumerate(typo_chars, start=CONFIG.BORDER_PADDING.top):
-            for ix, c in enumerate(l, start=CONFIG.BORDER_PADDING.left):
-                if c:
-                    if iy + 1 > curs_y:
-                        curs_y = iy + 1
-                        curs_x = 1
-                    curs_x = ix + 2 if ix + 2 > curs_x and iy + 1 >= curs_y else curs_x
-                    self.sessionscreen.screen.addch(iy + 1, ix + 1, c, CONFIG.COLOR_SCHEME.wrong | curses.A_UNDERLINE)
+        self.y_base, self.x_base = (1 + CONFIG.BORDER_PADDING.top, 1 + CONFIG.BORDER_PADDING.left)
+        # what the pad holds and which part of it was shown last, None forces a full repaint
+        self.pad = None
+        self.text = None
+        self.top = None
+        self.width = None
+        self.last_frame = FrameStats(calls=0, cells=0, bytes=0)
+        self.cursor = (0, 0)  # where the text cursor is on the screen
+        self.calls = 0
+        self.cells = 0
+        self.bytes = 0
+
+    @PROFILER.timed("render")
+    def render(self, text: SessionTextObject):
+        y, x = self.sessionscreen.getmaxyx()
+        width, height = x - 2, y - 2
+        layout = text.get_layout(width)
+        self.calls = self.cells = self.bytes = 0
+
+        if text is not self.text or width != self.width:
+            # new section or resized: paint the whole section into a new pad
+            self.pad = self.backend.newpad(max(len(layout.lines), height), width + 1)
+            for n, l in enumerate(layout.lines):
+                self.draw_line(text, l, n)
+            self.top = None
+        else:
+            self.draw_dirty(text, layout)
+        text.dirty.clear()
+
+        # Getting the position of the cursor so we know which line to center on
+        line, col, _ = text.position(len(text.typed), width=width)
+        top = viewport_top(len(layout.lines), focus_line=line, height=height)
+        marker_top = top > 0
+        marker_bottom = top + height < len(layout.lines)
+        if top != self.top:
+            self.put(self.sessionscreen.screen, 0, 0, ("^^^" if marker_top else "").ljust(width), self.attrs[CharState.CORRECT])
+            self.put(self.sessionscreen.screen, height - 1, 0, ("vvv" if marker_bottom else "").ljust(width), 0)
+        self.text, self.top, self.width = text, top, width
+
+        # the cursor is set in both windows, get_wch refreshes the sessionscreen and moves the cursor there
+        self.sessionscreen.screen.move(self.y_base + line - top, self.x_base + col)
         self.sessionscreen.screen.noutrefresh()
+        first_row = 1 if marker_top else 0
+        last_row = height - 2 if marker_bottom else height - 1
+        beg_y, beg_x = self.sessionscreen.screen.getbegyx()
+        self.cursor = (beg_y + self.y_base + line - top, beg_x + self.x_base + col)
+        self.pad.move(line, col)
+        if last_row < first_row:
+            # window to small to show anything but the markers
+            self.last_frame = FrameStats(calls=self.calls, cells=self.cells, bytes=self.bytes)
+            return
+        self.pad.noutrefresh(
+            top + first_row,
+            0,
+            beg_y + self.y_base + first_row,
+            beg_x + self.x_base,
+            beg_y + self.y_base + last_row,
+            beg_x + self.x_base + width - 1,
+        )
+        self.last_frame = FrameStats(calls=self.calls, cells=self.cells, bytes=self.bytes)
 
-        # Routine for wpm and accuracy
-        # TODO: there is definitely unnecessary redundancy here
+    def put(self, window: curses._CursesWindow, y: int, x: int, s: str, attr: int):
+        """screen coordinates are relative to the text area, pad coordinates aren't"""
+        if window is self.pad:
+            window.addstr(y, x, s, attr)
+        else:
+            window.addstr(self.y_base + y, self.x_base + x, s, attr)
+        self.calls += 1
+        self.cells += len(s)
+        self.bytes += len(s.encode())
+
+    def put_runs(self, text: SessionTextObject, line: LayoutLine, n: int, d0: int, d1: int):
+        """paint cells d0..d1 of line n into the pad, neighbouring cells with the same attribute go out in one call"""
+        run_start, run_chars, run_state = d0, [], None
+        for d in range(d0, d1):
+            c, state = text.cell(d)
+            if state != run_state and run_chars:
+                self.put(self.pad, n, run_start - line.start, "".join(run_chars), self.attrs[run_state])
+                run_start, run_chars = d, []
+            run_chars.append(c)
+            run_state = state
+        if run_chars:
+            self.put(self.pad, n, run_start - line.start, "".join(run_chars), self.attrs[run_state])
+
+    def draw_line(self, text: SessionTextObject, l: LayoutLine, n: int):
+        # typed chars in their colors, then the rest of the 'guide' chars
+        typed_end = max(l.start, min(l.end, text.typed_cells()))
+        self.put_runs(text, l, n, l.start, typed_end)
+        if typed_end < l.end:
+            self.put(self.pad, n, typed_end - l.start, l.text[typed_end - l.start :], 0)
+
+    def draw_dirty(self, text: SessionTextObject, layout: TextLayout):
+        """paint the cells of changed chars, contiguous cells on one line are painted together"""
+        cells = sorted(d for i in text.dirty for d in range(text.display_offsets[i], text.display_offsets[i + 1]))
+        span_start = None
+        for n, d in enumerate(cells):
+            if span_start is None:
+                span_start = d
+            if n + 1 < len(cells) and cells[n + 1] == d + 1 and layout.cell_line[d + 1] == layout.cell_line[d]:
+                continue
+            line = layout.cell_line[d]
+            self.put_runs(text, layout.lines[line], line, span_start, d + 1)
+            span_start = None
 
-        self.wpmscreen.addstr(1, 1, self.wpm_call())
-        self.wpmscreen.noutrefresh()
-        self.accscreen.addstr(1, 1, self.acc_call())
-        self.accscreen.noutrefresh()
-        curses.doupdate()
-        self.sessionscreen.screen.move(curs_y, curs_x)
+
+# }}}
+
+
+@dataclass()
+class ReplayResult:
+    wpm: float
+    accuracy: float
+    typo_errors: List[TypoError]
+    carryovers: List[tuple[float, int]]  # (accuracy, typed chars) per section, including the last one
+
+
+def replay_session(sections: List[str], log: KeystrokeLog) -> ReplayResult:
+    """feed recorded keys into a headless session, the timestamps of the log are used for wpm"""
+    sessionrepr = SessionFileRepr(title="replay", options=SessionOptions(RandomShuffle=False), sections=sections)
+    session = Session(None, sessionrepr)
+    session.t_start_ns = log.t_start_ns
+    end_ns = log.t_start_ns
+    # the keys are applied to the text directly, recording them into session.keylog again would only cost time
+    text = session.text
+    for n, outcome in enumerate(log.outcome):
+        end_ns = log.t_ns[n]
+        if outcome >= KeyOutcome.BACKSPACE:
+            text.type_backspace()
+            continue
+        text.type_char(chr(log.key[n]))
+        if text.is_complete():
+            if not session.has_next_section():
+                break
+            session.next_section()
+            text = session.text
+    return ReplayResult(
+        wpm=session.calc_wpm(end_ns),
+        accuracy=session.calc_acc(),
+        typo_errors=session.corrected_errors_carryover + session.text.corrected_errors,
+        carryovers=session.acc_typed_carryover + [(session.text.get_accuracy(), session.text.completed_count())],
+    )
 
 
 def init_main_screen() -> curses._CursesWindow:
@@ -684,65 +2234,148 @@ def init_main_screen() -> curses._CursesWindow:
     return screen
 
 
-def sessionloop(session: Session):
+def init_virtual_screen(nlines: int, ncols: int) -> VirtualWindow:
+    """like init_main_screen, but for an in-memory VirtualScreen; the backend is the window's .screen"""
+    screen = VirtualScreen(nlines, ncols)
+    CONFIG.COLOR_SCHEME = ColorScheme.default(backend=screen)
+    return screen.stdscr
+
 
+@PROFILER.timed("handle_key")
+def handle_key(session: Session, inp_char: Union[str, int], t_ns: Optional[int] = None) -> bool:
+    """apply one key to the session without drawing it, returns False if the session should end"""
+    inp_key = ord(inp_char) if isinstance(inp_char, str) else inp_char
+    if inp_key == curses.KEY_RESIZE:
+        # redraw screen
+        logger.debug("Redraw due to resize")
+        session.draw_session()
+    elif inp_key == curses.KEY_MOUSE:
+        # these can translate to scroll-down and scroll-up, requires mousemask
+        try:
+            getmouse = curses.getmouse()
+        except curses.error:
+            getmouse = None
+        logger.debug("Got mouse event inp_char,inp_key(%r, %r), getmouse: %s", inp_char, inp_key, getmouse)
+    elif inp_key in [
+        curses.KEY_UP,
+        curses.KEY_DOWN,
+        curses.KEY_LEFT,
+        curses.KEY_RIGHT,
+    ]:
+        if inp_key == curses.KEY_UP:
+            logger.debug("Got arrow key: Up")
+        elif inp_key == curses.KEY_DOWN:
+            logger.debug("Got arrow key: Down")
+        elif inp_key == curses.KEY_LEFT:
+            logger.debug("Got arrow key: Left")
+        elif inp_key == curses.KEY_RIGHT:
+            logger.debug("Got arrow key: Right")
+    elif inp_key == curses.KEY_F2:
+        session.toggle_hud()
+    elif inp_key == 27:
+        # ESC key
+        logger.debug("Got esc event inp_char,inp_key(%r, %r)", inp_char, inp_key)
+        return False
+    elif inp_key == curses.KEY_BACKSPACE or inp_key == 127 or str(inp_char) == "^?":
+        # elif inp_key in [curses.KEY_BACKSPACE, '\b', '\x7f']:
+        session.type_backspace(t_ns)
+    elif inp_char in CONFIG.VALID_INPUTS:
+        assert isinstance(inp_char, str)
+        session.type_char(inp_char, t_ns)
+        if session.is_complete():
+            logger.debug("Completed xyz")
+            session.next_section()
+    else:
+        logger.info("Received unknown keypress: %s, %r", inp_key, inp_char)
+    return True
+
+
+@PROFILER.timed("read_keys")
+def read_pending_keys(window: curses._CursesWindow) -> List[tuple[Union[str, int], int]]:
+    """read all keys that are available right now without blocking, each with the time it was read"""
+    window.nodelay(True)
+    keys = []
     while True:
-        # FIX: this is the input handling, this MUST be compartmentalized!!
         try:
-            # set halfdelay, aka timeout mode and reset immediately after
-            # timeout is needed, if we block until next input timer can't update
-            curses.halfdelay(5)
-            inp_char = session.sessionscreen.screen.get_wch()
-            curses.nocbreak()
-            curses.cbreak()
+            keys.append((window.get_wch(), time.monotonic_ns()))
         except curses.error:
-            # this updates wpm
-            session.draw_characters()
-            continue
-        inp_key = ord(inp_char) if isinstance(inp_char, str) else inp_char
-        if inp_key == curses.KEY_RESIZE:
-            # redraw screen
-            logger.debug("Redraw due to resize")
-            session.draw_session()
-        elif inp_key == curses.KEY_MOUSE:
-            # these can translate to scroll-down and scroll-up, requires mousemask
-            try:
-                getmouse = curses.getmouse()
-            except curses.error:
-                getmouse = None
-            logger.debug(f"Got mouse event inp_char,inp_key{inp_char, inp_key}, getmouse: {getmouse}")
-        elif inp_key in [
-            curses.KEY_UP,
-            curses.KEY_DOWN,
-            curses.KEY_LEFT,
-            curses.KEY_RIGHT,
-        ]:
-            if inp_key == curses.KEY_UP:
-                logger.debug("Got arrow key: Up")
-            elif inp_key == curses.KEY_DOWN:
-                logger.debug("Got arrow key: Down")
-            elif inp_key == curses.KEY_LEFT:
-                logger.debug("Got arrow key: Left")
-            elif inp_key == curses.KEY_RIGHT:
-                logger.debug("Got arrow key: Right")
-        elif inp_key == 27:
-            # ESC key
-            logger.debug(f"Got esc event inp_char,inp_key{inp_char, inp_key},{curses.ungetch(inp_char)}")
-            curses.endwin()
-            break
-        elif inp_key == curses.KEY_BACKSPACE or inp_key == 127 or str(inp_char) == "^?":
-            # elif inp_key in [curses.KEY_BACKSPACE, '\b', '\x7f']:
-            session.type_backspace()
-            session.draw_characters()
-        elif inp_char in CONFIG.VALID_INPUTS:
-            assert isinstance(inp_char, str)
-            session.type_char(inp_char)
-            if session.is_complete():
-                logger.info("Completed xyz")
-                session.next_section()
-            session.draw_characters()
-        else:
-            logger.info(f"Received unknown keypress: {inp_key}, {repr(inp_char)}")
+            # no complete key available (yet)
+            return keys
+
+
+class RenderScheduler:
+    """limits how often frames are drawn; state changes only mark the screen dirty"""
+
+    def __init__(self, max_fps: int) -> None:
+        self.interval = 1 / max_fps if max_fps > 0 else 0.0
+        self.dirty = False
+        self.last_flush = float("-inf")
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def timeout(self, now: float) -> Optional[float]:
+        """seconds until a pending frame may be drawn, None if there is nothing to draw"""
+        if not self.dirty:
+            return None
+        return max(0.0, self.last_flush + self.interval - now)
+
+    def flush(self, now: float, draw) -> bool:
+        """draw if something is pending and the last frame is old enough"""
+        if not self.dirty or now < self.last_flush + self.interval:
+            return False
+        draw()
+        self.dirty = False
+        self.last_flush = now
+        return True
+
+
+def sessionloop(session: Session):
+    """
+    Wait for input on the terminal, the stats timer and pending frames at the same time. Keys are applied
+    to the session as soon as they arrive, drawing them is limited to CONFIG.MAX_FPS frames per second.
+    The timer only redraws the wpm and accuracy windows and the profiling overlay.
+    """
+    selector = selectors.DefaultSelector()
+    selector.register(sys.stdin, selectors.EVENT_READ)
+    scheduler = RenderScheduler(CONFIG.MAX_FPS)
+    next_stats = time.monotonic() + CONFIG.STATS_INTERVAL
+    oldest_key_ns = None  # read time of the oldest key that isn't on screen yet
+    try:
+        while True:
+            now = time.monotonic()
+            if scheduler.flush(now, session.draw_characters):
+                next_stats = now + CONFIG.STATS_INTERVAL
+                if oldest_key_ns is not None:
+                    PROFILER.record("key_to_frame", time.monotonic_ns() - oldest_key_ns)
+                    oldest_key_ns = None
+            elif now >= next_stats:
+                session.draw_stats()
+                session.draw_hud()
+                # the stats windows leave the cursor alone, without this it would stay behind the wpm
+                session.backend.setsyx(*session.renderer.cursor)
+                session.backend.doupdate()
+                next_stats = now + CONFIG.STATS_INTERVAL
+            timeout = next_stats - now
+            frame_timeout = scheduler.timeout(now)
+            if frame_timeout is not None:
+                timeout = min(timeout, frame_timeout)
+            selector.select(timeout)
+            # also poll on timer wakeups, a resize (SIGWINCH) is only reported by the next get_wch
+            keys = read_pending_keys(session.sessionscreen.screen)
+            if not keys:
+                continue
+            # apply everything that arrived since the last frame, the frame is drawn at the top of the loop
+            for inp_char, t_ns in keys:
+                if not handle_key(session, inp_char, t_ns):
+                    curses.endwin()
+                    return
+            scheduler.mark_dirty()
+            if oldest_key_ns is None:
+                oldest_key_ns = keys[0][1]
+    finally:
+        selector.close()
+        logger.info("Recorded %d keys in %d bytes", len(session.keylog), session.keylog.nbytes())
 
 
 def make_menu(parent: curses._CursesWindow, menu_content: List[str]):
@@ -795,7 +2428,19 @@ def make_grid(parent: curses._CursesWindow, width: int, height: int):
 
 
 class ViewportGrid:
-    def __init__(self, parent: curses._CursesWindow, cell_width: int, cell_height: int, content) -> None:
+    def __init__(
+        self,
+        parent: curses._CursesWindow,
+        cell_width: int,
+        cell_height: int,
+        content,
+        search: Optional[SearchIndex] = None,
+        preview: Optional[SessionPreview] = None,
+    ) -> None:
+        """
+        with a search index typed chars filter the rows, the query is shown in the last row of the grid.
+        A preview shows details about the highlighted row below the grid.
+        """
         assert len(content) > 0
         assert len(content[0]) > 0
         assert all([len(content[0]) == len(content[i]) for i in range(len(content))])  # all elements have equal length
@@ -803,14 +2448,16 @@ class ViewportGrid:
         self.cell_width = cell_width
         self.cell_height = cell_height
         self.content = content
+        self.search = search
+        self.preview = preview
+        self.preview_loading = False  # get_wch times out to draw the preview again when the file is loaded
+        self.rows = range(len(content))  # rows of content that are shown, in order
         self.cells_y = len(content)
         self.cells_x = len(content[0])
         if any([x < 1 for x in [self.cell_width, self.cell_height, self.cells_y, self.cells_x]]):
             raise ValueError("Error")
 
-        self.view_max_y, self.view_max_x = parent.getmaxyx()
-        self.view_cells_max_y = self.view_max_y // cell_height
-        self.view_cells_max_x = self.view_max_x // cell_width
+        self.refresh_dimensions()
 
         # top left coordinates of viewport
         self.pos_x = 0
@@ -820,93 +2467,114 @@ class ViewportGrid:
         self.cursor_y = 0
         self.CURSOR_SPACING = 2  # keep border of cells around selected
 
-        self.char_buffer = [[" "] * cell_width * self.cells_x for _ in range(cell_height * self.cells_y)]  # [y][x]
+        # only cells that were visible at some point get wrapped, see cell_lines
+        self.wrapped = {}  # (content row, x) -> lines of the cell
         return
 
     def refresh_dimensions(self):
         self.view_max_y, self.view_max_x = self.parent.getmaxyx()
+        self.screen_max_y = self.view_max_y
+        if self.preview is not None:
+            # the preview gets the bottom of the screen, but never more than half of it
+            self.view_max_y -= min(self.preview.height + 1, self.view_max_y // 2)
         self.view_cells_max_y = self.view_max_y // self.cell_height
         self.view_cells_max_x = self.view_max_x // self.cell_width
 
-    def make_char_buffer(self):
-        # create char buffer
-        i = 0
-        start = time.time()
-        logger.debug(f"buffersize:{len(self.char_buffer),len(self.char_buffer[0])}")
-        for y in range(self.cells_y):
-            for x in range(self.cells_x):
-                y_ = y * self.cell_height
-                x_ = x * self.cell_width
-
-                content = self.content[y][x]
-
-                # if i % 2 == 0:
-                #     content = f"{i}_________________________________________________________________"  # TODO: give content as param
-                # else:
-                #     content = f"{i}XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX"  # TODO: give content as param
-
-                # prepare content for each cell
-                content = wrap(content, self.cell_width)[: self.cell_height]
-
-                # walk through all chars in content, break on oversteping cell limits
-                for l_idx in range(self.cell_height):
-                    if l_idx >= len(content):
-                        # logger.debug(f"break:{l_idx} > len({content})={len(content)}")
-                        break
-                    for c_idx in range(self.cell_width):
-                        if c_idx >= len(content[l_idx]):
-                            # logger.debug(f"break:{c_idx} > len({content[l_idx]})={len(content[l_idx])}")
-                            break
-                        self.char_buffer[y_ + l_idx][x_ + c_idx] = content[l_idx][c_idx]
-                i += 1
-
-        logger.info(f"Took {time.time()-start}s")
-        # char_buffer_str = "\n".join(["".join(e) for e in char_buffer])
-        return
-
-    def next_x_cell_border(self, x_pos: int) -> int:
-        ret = 0
-        while ret <= x_pos:
-            ret += self.cell_width
-        return ret
-
-    def next_y_cell_border(self, y_pos: int) -> int:
-        ret = 0
-        while ret <= y_pos:
-            ret += self.cell_height
-        return ret
+    def cell_lines(self, y: int, x: int) -> List[str]:
+        """content of cell y,x wrapped into the cell, every line padded to cell_width"""
+        row = self.rows[y]
+        lines = self.wrapped.get((row, x))
+        if lines is None:
+            lines = [l.ljust(self.cell_width) for l in wrap(str(self.content[row][x]), self.cell_width)[: self.cell_height]]
+            lines += [" " * self.cell_width] * (self.cell_height - len(lines))
+            self.wrapped[(row, x)] = lines
+        return lines
+
+    def set_rows(self, rows: Sequence[int]):
+        """show only these rows of content, the cursor goes back to the first one"""
+        self.rows = rows
+        self.cells_y = len(rows)
+        self.cursor_y = self.cursor_x = 0
+        self.pos_y = self.pos_x = 0
+
+    def draw_query(self):
+        """search query and number of matches in the last screen row, which the grid leaves empty"""
+        status = f"/{self.search.query}  ({self.cells_y}/{len(self.content)})"
+        if self.search.text_pending:
+            status += "  text is searched from 3 chars"
+        # not into the last column, that would be the bottom right corner
+        self.parent.addstr(self.view_max_y - 1, 0, status[: self.view_max_x - 1].ljust(self.view_max_x - 1), curses.A_BOLD)
+
+    def draw_cell_line(self, view_y: int, cell_y: int, line: int, cell_x: int) -> int:
+        """paint the visible part of one line of a cell into screen row view_y, returns the column behind it"""
+        start = cell_x * self.cell_width - self.pos_x
+        view_x = max(start, 0)
+        offset = view_x - start
+        insert_str = self.cell_lines(cell_y, cell_x)[line][offset : offset + self.view_max_x - view_x]
+        if self.cursor_x == cell_x and self.cursor_y == cell_y:
+            attr = curses.A_STANDOUT
+        else:
+            attr = 0
+        try:
+            self.parent.addstr(view_y, view_x, insert_str, attr)
+        except curses.error as e:
+            logger.warning("Error when adding str len(%d) at pos (%d, %d)", len(insert_str), view_y, view_x)
+            raise e
+        return view_x + len(insert_str)
+
+    def draw_row(self, view_y: int):
+        """paint one screen row, only the cells that are (partly) inside the viewport are looked at"""
+        cell_y, line = divmod(view_y + self.pos_y, self.cell_height)
+        if cell_y >= self.cells_y:
+            return
+        view_x = 0
+        cell_x = self.pos_x // self.cell_width
+        while view_x < self.view_max_x and cell_x < self.cells_x:
+            view_x = self.draw_cell_line(view_y, cell_y, line, cell_x)
+            cell_x += 1
+
+    def draw_cell(self, cell_y: int, cell_x: int):
+        """paint whatever part of one cell is visible, e.g. when the highlight moved"""
+        start_x = cell_x * self.cell_width - self.pos_x
+        if start_x >= self.view_max_x or start_x + self.cell_width <= 0:
+            return
+        for line in range(self.cell_height):
+            view_y = cell_y * self.cell_height + line - self.pos_y
+            if 0 <= view_y < self.view_max_y - 1:
+                self.draw_cell_line(view_y, cell_y, line, cell_x)
 
-    def draw_char_buffer(self):
-        # draw char buffer
+    def draw_viewport(self):
+        # the last row stays empty, writing into the bottom right corner is an error in curses
         for view_y in range(self.view_max_y - 1):
-            if view_y + self.pos_y >= len(self.char_buffer):
-                break
-            view_x = 0
-            current_cell_y = (view_y + self.pos_y) // self.cell_height
-            while view_x < self.view_max_x:
-                # find next cell border from current position
-                current_cell_x = (view_x + self.pos_x) // self.cell_width
-                cborder_x = self.next_x_cell_border(view_x + self.pos_x)
-                if cborder_x >= self.view_max_x + self.pos_x + self.cell_width:
-                    break
-                if cborder_x >= self.view_max_x + self.pos_x:
-                    cborder_x = self.view_max_x + self.pos_x
-                insert_str = "".join(self.char_buffer[view_y + self.pos_y][view_x + self.pos_x : cborder_x])
-                if self.cursor_x == current_cell_x and self.cursor_y == current_cell_y:
-                    attr = curses.A_STANDOUT
-                else:
-                    attr = 0
-                # logger.debug(f"Trying to add at pos({view_y,view_x}), charbufferpos({view_y+pos_y,view_x+pos_x}) str of len {len(insert_str)}: \"{insert_str}\"")
-                try:
-                    self.parent.addstr(view_y, view_x, insert_str, attr)
-                except curses.error as e:
-                    logger.warn(f"Error when adding str len({len(insert_str)}) at pos ({view_y,view_x})")
-                    raise e
-                assert cborder_x - self.pos_x > view_x
-                view_x = cborder_x - self.pos_x
-            self.parent.noutrefresh()
-            self.parent.refresh()
-        return
+            self.draw_row(view_y)
+        if self.search is not None:
+            self.draw_query()
+        self.draw_preview()
+
+    def draw_preview(self):
+        """fill the rows below the grid; while the file is loading get_wch times out to draw it again"""
+        if self.preview is None:
+            return
+        width = self.view_max_x - 1  # not into the last column, see draw_query
+        lines, loading = [], False
+        if self.cells_y > 0:
+            lines, loading = self.preview.lines(self.rows[self.cursor_y], width)
+        self.parent.addstr(self.view_max_y, 0, "─" * width)
+        for n, view_y in enumerate(range(self.view_max_y + 1, self.screen_max_y)):
+            self.parent.addstr(view_y, 0, (lines[n] if n < len(lines) else "")[:width].ljust(width))
+        self.preview_loading = loading
+        self.parent.timeout(50 if loading else -1)
+
+    def scroll_rows(self, n: int):
+        """move what is on screen up by n rows (down if negative) and paint the rows that became visible"""
+        self.parent.setscrreg(0, self.view_max_y - 2)
+        # only while scrolling, otherwise painting the last column of the last row would scroll as well
+        self.parent.scrollok(True)
+        self.parent.scroll(n)
+        self.parent.scrollok(False)
+        rows = range(self.view_max_y - 1 - n, self.view_max_y - 1) if n > 0 else range(-n)
+        for view_y in rows:
+            self.draw_row(view_y)
 
     def pos_x_change(self, cursor_move: int):
         if cursor_move < -1 or cursor_move > 1:
@@ -917,7 +2585,7 @@ class ViewportGrid:
         overflow = self.view_max_x - self.view_cells_max_x * self.cell_width
 
         current_cell_relative_to_view = self.cursor_x - self.pos_x // self.cell_width
-        logger.debug(f"Relative cursor(x):{current_cell_relative_to_view}")
+        logger.debug("Relative cursor(x):%s", current_cell_relative_to_view)
         assert current_cell_relative_to_view <= self.view_cells_max_x
         assert current_cell_relative_to_view >= 0
 
@@ -929,12 +2597,12 @@ class ViewportGrid:
                     self.pos_x = min([self.pos_x, self.cells_x * self.cell_width - self.view_max_x])
                 else:
                     self.pos_x = 0
-                logger.debug(f"Moving viewport({cursor_move}): cursor:{self.cursor_y,self.cursor_x}, new pos_x:{self.pos_x}")
+                logger.debug("Moving viewport(%d): cursor:(%d, %d), new pos_x:%d", cursor_move, self.cursor_y, self.cursor_x, self.pos_x)
         else:
             if current_cell_relative_to_view - self.CURSOR_SPACING <= 0:
                 self.pos_x = (self.cursor_x - self.CURSOR_SPACING) * self.cell_width
                 self.pos_x = max([self.pos_x, 0])
-                logger.debug(f"Moving viewport({cursor_move}): cursor:{self.cursor_y,self.cursor_x}, new pos_x:{self.pos_x}")
+                logger.debug("Moving viewport(%d): cursor:(%d, %d), new pos_x:%d", cursor_move, self.cursor_y, self.cursor_x, self.pos_x)
 
         assert self.pos_x >= 0
         assert self.pos_x < self.cells_x * self.cell_width
@@ -948,7 +2616,7 @@ class ViewportGrid:
         overflow = self.view_max_y - self.view_cells_max_y * self.cell_height
 
         current_cell_relative_to_view = self.cursor_y - self.pos_y // self.cell_height
-        logger.debug(f"Relative cursor(y):{current_cell_relative_to_view}")
+        logger.debug("Relative cursor(y):%s", current_cell_relative_to_view)
         assert current_cell_relative_to_view <= self.view_cells_max_y
         assert current_cell_relative_to_view >= 0
 
@@ -956,35 +2624,66 @@ class ViewportGrid:
             if current_cell_relative_to_view + self.CURSOR_SPACING >= self.view_cells_max_y:
                 self.pos_y = ((self.cursor_y - self.view_cells_max_y) + self.CURSOR_SPACING) * self.cell_height + overflow
                 self.pos_y = min(self.pos_y, self.cells_y * self.cell_height - self.view_max_y)
-                logger.debug(f"Moving viewport({cursor_move}): cursor:{self.cursor_y,self.cursor_x}, new pos_y:{self.pos_y}")
+                logger.debug("Moving viewport(%d): cursor:(%d, %d), new pos_y:%d", cursor_move, self.cursor_y, self.cursor_x, self.pos_y)
         else:
             if current_cell_relative_to_view - self.CURSOR_SPACING <= 0:
                 self.pos_y = (self.cursor_y - self.CURSOR_SPACING) * self.cell_height
                 self.pos_y = max([self.pos_y, 0])
-                logger.debug(f"Moving viewport({cursor_move}): cursor:{self.cursor_y,self.cursor_x}, new pos_y:{self.pos_y}")
+                logger.debug("Moving viewport(%d): cursor:(%d, %d), new pos_y:%d", cursor_move, self.cursor_y, self.cursor_x, self.pos_y)
 
         assert self.pos_y >= 0
         assert self.pos_y < self.cells_y * self.cell_height
 
     def make_viewport_grid(self) -> tuple[int, int]:
-        # redraw all
+        """
+        let the user pick a cell, returns its (y, x) in content. Only the first frame, resizes and a changed
+        search repaint everything, moving the cursor repaints the two cells whose highlight changed and
+        scrolls what is already on screen. The frame is put on the terminal by the refresh that get_wch does.
+        """
+        self.parent.idlok(True)  # allow curses to use the terminal's scrolling
+        clear = True
+        redraw = True
         while True:
-            self.parent.clear()
-            self.refresh_dimensions()
-            logger.debug(f"Screen size: {self.view_max_y,self.view_max_x}")
-
-            self.make_char_buffer()
-
-            self.draw_char_buffer()
-
-            inp_char = self.parent.get_wch()
+            if redraw:
+                if clear:
+                    self.parent.clear()
+                else:
+                    self.parent.erase()
+                self.refresh_dimensions()
+                logger.debug("Screen size: (%d, %d)", self.view_max_y, self.view_max_x)
+                self.draw_viewport()
+                clear = redraw = False
+
+            last_cursor = (self.cursor_y, self.cursor_x)
+            last_pos = (self.pos_y, self.pos_x)
+            try:
+                inp_char = self.parent.get_wch()
+            except curses.error:
+                if not self.preview_loading:
+                    raise
+                # timed out while the preview was loading
+                self.draw_preview()
+                continue
             inp_key = ord(inp_char) if isinstance(inp_char, str) else inp_char
-            curses.nocbreak()
-            curses.cbreak()
             if inp_key == curses.KEY_RESIZE:
+                clear = redraw = True
                 continue
             elif inp_char == "\n":
-                break
+                if self.cells_y > 0:
+                    break
+            elif self.search is not None and inp_key in (curses.KEY_BACKSPACE, 127, 8):
+                self.set_rows(self.search.pop())
+                redraw = True
+                continue
+            elif self.search is not None and inp_key == 27:
+                # ESC
+                self.set_rows(self.search.clear())
+                redraw = True
+                continue
+            elif self.search is not None and isinstance(inp_char, str) and inp_char.isprintable():
+                self.set_rows(self.search.push(inp_char))
+                redraw = True
+                continue
             elif inp_key == curses.KEY_DOWN:
                 if self.cursor_y + 1 < self.cells_y:
                     self.cursor_y += 1
@@ -1001,15 +2700,46 @@ class ViewportGrid:
                 if self.cursor_x > 0:
                     self.cursor_x -= 1
                     self.pos_x_change(-1)
-        return (self.cursor_y, self.cursor_x)
+
+            scrolled = self.pos_y - last_pos[0]
+            if self.pos_x != last_pos[1] or abs(scrolled) >= self.view_max_y - 1:
+                redraw = True
+            elif (self.cursor_y, self.cursor_x) != last_cursor or scrolled:
+                if scrolled:
+                    self.scroll_rows(scrolled)
+                self.draw_cell(*last_cursor)
+                self.draw_cell(self.cursor_y, self.cursor_x)
+                if self.cursor_y != last_cursor[0]:
+                    self.draw_preview()
+        self.parent.timeout(-1)
+        return (self.rows[self.cursor_y], self.cursor_x)
 
 
 def session_validate(fpath) -> bool:
-    return fpath.endswith("yaml") or fpath.endswith("yml")
+    return fpath.endswith("yaml") or fpath.endswith("yml") or fpath.endswith(".txt")
+
+
+def scan_session_files(basepath: str) -> List[tuple[str, os.stat_result]]:
+    """
+    session files in the directory tree below basepath as (abspath, stat), depth first in directory order.
+    Symlinks to directories aren't followed, they could loop or list the same files twice.
+    """
+    content = []
+    with os.scandir(basepath) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                try:
+                    content.extend(scan_session_files(entry.path))
+                except OSError as e:
+                    logger.warning("Skipping directory %s: %s", entry.path, e)
+            elif session_validate(entry.name) and entry.is_file():
+                content.append((os.path.abspath(entry.path), entry.stat()))
+    return content
 
 
 def main():
     screen = None
+    session = None
     try:
         # curses.setupterm('alacritty')  # no need to set this up!
         logger.info(f"Starting main function")
@@ -1025,21 +2755,22 @@ def main():
         content = [["A"], ["B"], ["C"], ["DDDDDDDDDDDDDDDDDDDDDDDDDD"]]
         content = [[0] * 21] * 32
         content = [[d] for d in os.listdir("./typo/res/")]
-        content = []
-        basepath = "./typo/res/"
-        for p in os.listdir(basepath):
-            if os.path.isdir(f"{basepath}/{p}"):
-                content.extend([[os.path.abspath(f"{basepath}/{p}/{f}")] for f in os.listdir(f"{basepath}/{p}") if session_validate(f)])
-            elif session_validate(p):
-                content.append([os.path.abspath(f"{basepath}/{p}")])
-
-        y, x = ViewportGrid(screen, cell_width=128, cell_height=1, content=content).make_viewport_grid()
+        index = CorpusIndex.load(RES_PATH)
+        entries = index.sessions()
+        content = [[e.label(RES_PATH)] for e in entries]
+        search = SearchIndex.from_corpus(entries, index)
+        sessions = SessionCache(maxsize=32)
+        preview = SessionPreview(entries, sessions)
+
+        y, x = ViewportGrid(screen, cell_width=128, cell_height=1, content=content, search=search, preview=preview).make_viewport_grid()
         logger.critical(f"Got {y,x}")
         # ViewportGrid(screen,cell_width=7,cell_height=3,cells_y=12,cells_x=17).make_viewport_grid()
 
-        testpath = content[y][x]
+        testpath = entries[y].path
 
-        session_repr = SessionFileRepr.load_from_file(testpath)
+        # usually already parsed for the preview
+        session_repr = sessions.load(testpath).shuffled()
+        sessions.shutdown()
         logger.info(f"Screen size: {screen.getmaxyx()}")
         session = Session(screen, session_repr)
         sessionloop(session)
@@ -1049,7 +2780,44 @@ def main():
             curses.nocbreak()
             curses.echo()
             curses.endwin()
+        if session is not None:
+            # keep the keys of the last session, they can be scored again with replay_session
+            session.keylog.save(KEYLOG_PATH, session.typed_sections)
+        for line in PROFILER.summary():
+            logger.info(f"Timing: {line}")
+
+
+def ingest(argv: List[str]) -> int:
+    """parse, validate and index every session file below a directory, see --help"""
+    parser = argparse.ArgumentParser(prog="main_3.0.py ingest", description="parse, validate and index all session files below DIR")
+    parser.add_argument("dir", help="directory with session files, the picker uses " + RES_PATH)
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="worker processes, 1 parses in this process")
+    parser.add_argument("--force", action="store_true", help="parse files again even if the index says they didn't change")
+    args = parser.parse_args(argv)
+
+    index = CorpusIndex.load(args.dir)
+    start = time.perf_counter()
+    if args.jobs > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker_logging) as executor:
+            n_files = len(scan_session_files(index.basepath))
+            entries = index.update(executor, chunksize=max(1, n_files // (4 * args.jobs)), force=args.force)
+    else:
+        entries = index.update(force=args.force)
+    elapsed = time.perf_counter() - start
+
+    failed = [e for e in entries if e.error is not None]
+    parsed = index.last_parsed
+    size = sum(e.size for e in parsed)
+    for e in failed:
+        print(f"FAILED {os.path.relpath(e.path, index.basepath)}: {e.error}")
+    print(
+        f"{len(entries)} files, {len(failed)} failed, parsed {len(parsed)} files / {size / 1e6:.1f} MB in {elapsed:.2f}s "
+        f"({len(parsed) / elapsed:.0f} files/s, {size / 1e6 / elapsed:.1f} MB/s), index: {index.index_path}"
+    )
+    return 1 if failed else 0
 
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["ingest"]:
+        sys.exit(ingest(sys.argv[2:]))
     main()
@@ -0,0 +1,244 @@
+"""
+End-to-end input latency of the whole program, measured through a pseudo-terminal.
+
+Starts main_3.0.py on a pty, selects a session file in the picker, types the first section at fixed
+rates and timestamps when the typed char is painted. The output is fed into a terminal emulator
+(pyte, pip install pyte): a key counts as painted once the screen shows as many cells in the color of
+correctly typed text as its char needs. Reports the latency distribution and the bytes written per key
+for every rate, as json:
+
+    python typo/pty_latency.py --session typo/res/S1.yml --rates 10,50,200 -o latency.json
+"""
+from __future__ import annotations
+
+import argparse
+import curses
+import fcntl
+import json
+import os
+import pty
+import select
+import signal
+import struct
+import sys
+import tempfile
+import termios
+import time
+from pathlib import Path
+
+from harness import load_typo, percentiles
+
+try:
+    import pyte
+except ImportError:
+    pyte = None
+
+HERE = Path(__file__).resolve().parent
+CORRECT_FG = "green"  # ColorScheme.default().correct as pyte names it
+
+
+class PtyProcess:
+    """main_3.0.py running on the slave side of a pty, we are the terminal"""
+
+    def __init__(self, rows: int, cols: int, term: str) -> None:
+        self.pid, self.fd = pty.fork()
+        if self.pid == 0:
+            fcntl.ioctl(0, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+            os.environ["TERM"] = term
+            os.execv(sys.executable, [sys.executable, str(HERE / "main_3.0.py")])
+        self.output = bytearray()
+        self.screen = pyte.Screen(cols, rows)
+        self.stream = pyte.ByteStream(self.screen)
+        self.correct = [0] * rows  # cells per row in the color of correctly typed text
+
+    def correct_cells(self) -> int:
+        return sum(self.correct)
+
+    def write(self, data: bytes):
+        os.write(self.fd, data)
+
+    def read(self, timeout: float) -> bytes:
+        """whatever arrives within timeout, b'' if nothing did"""
+        r, _, _ = select.select([self.fd], [], [], max(timeout, 0))
+        if not r:
+            return b""
+        try:
+            data = os.read(self.fd, 65536)
+        except OSError:
+            # child closed the pty
+            return b""
+        self.output += data
+        self.stream.feed(data)
+        for y in self.screen.dirty:
+            line = self.screen.buffer[y]
+            self.correct[y] = sum(1 for c in line.values() if c.fg == CORRECT_FG)
+        self.screen.dirty.clear()
+        return data
+
+    def wait_quiet(self, quiet: float, limit: float = 10.0) -> int:
+        """read until nothing was written for <quiet> seconds, returns the number of bytes read"""
+        n = 0
+        end = time.monotonic() + limit
+        while time.monotonic() < end:
+            data = self.read(quiet)
+            if not data:
+                break
+            n += len(data)
+        return n
+
+    def close(self):
+        for _ in range(50):
+            pid, _ = os.waitpid(self.pid, os.WNOHANG)
+            if pid:
+                return
+            time.sleep(0.02)
+        os.kill(self.pid, signal.SIGKILL)
+        os.waitpid(self.pid, 0)
+
+
+def type_at_rate(proc: PtyProcess, text: str, cells: list[int], rate: float, timeout: float) -> dict:
+    """
+    send one char every 1/rate seconds; key i counts as painted when the screen shows cells[i] correctly
+    typed cells. Keys still waiting after <timeout> seconds count as missed.
+    """
+    pending = []  # (correct cells once painted, send time), oldest first
+    latencies = []
+    missed = 0
+    start_bytes = len(proc.output)
+    t0 = time.monotonic()
+    next_send = t0
+    sent = 0
+    while sent < len(text) or pending:
+        now = time.monotonic()
+        if sent < len(text) and now >= next_send:
+            # before writing, the program can paint the key before write() returns
+            pending.append((cells[sent], time.monotonic()))
+            proc.write(text[sent].encode())
+            sent += 1
+            next_send = t0 + sent / rate
+        wait = next_send - time.monotonic() if sent < len(text) else timeout
+        data = proc.read(min(wait, 0.005) if pending else wait)
+        now = time.monotonic()
+        if data:
+            # one frame can paint several keys when the program coalesces them
+            painted = proc.correct_cells()
+            while pending and painted >= pending[0][0]:
+                latencies.append((now - pending[0][1]) * 1000)
+                pending.pop(0)
+        while pending and now - pending[0][1] > timeout:
+            pending.pop(0)
+            missed += 1
+    written = len(proc.output) - start_bytes
+    return {
+        "rate": rate,
+        "keys": sent,
+        "painted": len(latencies),
+        "missed": missed,
+        "latency_ms": percentiles(latencies),
+        "bytes": written,
+        "bytes_per_key": written / sent if sent else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--session", type=Path, default=HERE / "res" / "S1.yml", help="session file to type")
+    parser.add_argument("--rates", default="10,50,200", help="comma separated keys per second")
+    parser.add_argument("--keys", type=int, default=200, help="keys per rate")
+    parser.add_argument("--rows", type=int, default=40)
+    parser.add_argument("--cols", type=int, default=140)
+    parser.add_argument("--term", default="xterm-256color")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds after which a key counts as missed")
+    parser.add_argument("-o", "--output", type=Path, help="json file, default is stdout")
+    args = parser.parse_args()
+    if pyte is None:
+        parser.error("the terminal emulator is missing: pip install pyte")
+    args.session = args.session.resolve()
+    if args.output is not None:
+        args.output = args.output.resolve()
+
+    # typo.log, typo.keys and the corpus index are written to the cwd and the cache dir, both of the
+    # child and of this process, so everything runs in a temporary directory with typo/ linked into it
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="typo-pty-") as workdir:
+        os.symlink(HERE, os.path.join(workdir, "typo"))
+        os.environ["XDG_CACHE_HOME"] = os.path.join(workdir, "cache")
+        os.chdir(workdir)
+        try:
+            measure(parser, args)
+        finally:
+            os.chdir(cwd)
+
+
+def measure(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    typo = load_typo()
+    session_path = str(args.session)
+    # same index the picker builds, which also makes sure the child doesn't start with a cold one
+    entries = [os.path.realpath(e.path) for e in typo.CorpusIndex.load(typo.RES_PATH).sessions()]
+    if session_path not in entries:
+        parser.error(f"{session_path} is not one of the files the picker shows")
+    sessionrepr = typo.SessionFileRepr.load_from_file(session_path)
+    if sessionrepr.options.RandomShuffle:
+        print("RandomShuffle is on, the typed text won't match the section that is shown", file=sys.stderr)
+    rates = [float(r) for r in args.rates.split(",")]
+    # stay inside the first section, completing it would switch sections in the middle of a measurement
+    first = sessionrepr.first_section()
+    text = first[: len(first) - 1]
+    chunk = max(1, min(args.keys, len(text) // len(rates)))
+    # correctly typed cells on screen once char i is painted, tabs take more than one
+    offsets = typo.SessionTextObject(first).display_offsets
+
+    # the picker enables keypad mode, so arrows have to be sent the way the terminal would send them
+    curses.setupterm(args.term)
+    key_down = curses.tigetstr("kcud1")
+
+    proc = PtyProcess(args.rows, args.cols, args.term)
+    results = []
+    try:
+        startup = time.monotonic()
+        proc.wait_quiet(0.5)
+        for _ in range(entries.index(session_path)):
+            proc.write(key_down)
+        proc.write(b"\r")
+        session_bytes = proc.wait_quiet(0.5)
+        startup = time.monotonic() - startup
+        for n, rate in enumerate(rates):
+            start = n * chunk
+            keys = text[start : start + chunk]
+            r = type_at_rate(proc, keys, offsets[start + 1 : start + len(keys) + 1], rate, args.timeout)
+            results.append(r)
+            print(
+                f"rate={rate:<6} keys={r['keys']:<5} missed={r['missed']:<3} "
+                f"p50={r['latency_ms'].get('p50', 0):6.2f}ms p99={r['latency_ms'].get('p99', 0):6.2f}ms "
+                f"bytes/key={r['bytes_per_key']:.1f}",
+                file=sys.stderr,
+            )
+            proc.wait_quiet(0.2)
+        typed = min(len(rates) * chunk, len(text))
+        if proc.correct_cells() != offsets[typed]:
+            # scrolled text or a different color scheme, the latencies can't be trusted
+            print(f"expected {offsets[typed]} correctly typed cells on screen, found {proc.correct_cells()}", file=sys.stderr)
+        proc.write(b"\x1b")
+    finally:
+        proc.close()
+
+    report = {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "session": str(args.session),
+            "term": args.term,
+            "size": [args.rows, args.cols],
+            "startup_s": startup,
+            "session_start_bytes": session_bytes,
+        },
+        "results": results,
+    }
+    out = json.dumps(report, indent=2)
+    if args.output is None:
+        print(out)
+    else:
+        args.output.write_text(out)
+
+
+if __name__ == "__main__":
+    main()